@@ -0,0 +1,115 @@
+"""
+Admission control
+Caps how many callbacks are handled at once and how fast one client address
+can send them, so floods are shed before they turn into Zibal verify calls
+"""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+OVERLOADED = "overloaded"
+RATE_LIMITED = "rate_limited"
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets: ``rate`` tokens per second, up to ``burst``
+
+    Each key costs two floats, refilled lazily when the key is seen again.
+    A bucket left alone for ``burst / rate`` seconds is full, which is the
+    same as having no entry, so such idle entries are evicted from the
+    least recently used end as new keys arrive; ``maxsize`` bounds the
+    table regardless. Every call is O(1).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        maxsize: int = 100000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.idle_after = burst / rate
+        self._clock = clock
+        # key -> (tokens, last refill time)
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: str) -> bool:
+        """Take one token from ``key``'s bucket; False if it is empty"""
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._evict(now)
+            tokens = self.burst
+        else:
+            tokens, last = bucket
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            self._buckets.move_to_end(key)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        return allowed
+
+    def _evict(self, now: float) -> None:
+        # Drop at most two idle entries per new key, plus the oldest one when full
+        buckets = self._buckets
+        for _ in range(2):
+            if not buckets:
+                return
+            key, (_, last) = next(iter(buckets.items()))
+            if now - last < self.idle_after:
+                break
+            del buckets[key]
+        if len(buckets) >= self.maxsize:
+            buckets.popitem(last=False)
+
+
+class AdmissionController:
+    """
+    Decide whether to handle a callback or shed it
+
+    A callback is shed when ``max_in_flight`` callbacks are already being
+    handled (0 for no cap) or when its client address has no token left
+    (no per-address limit without a ``limiter``). Every admitted callback
+    must be followed by ``release``.
+    """
+
+    def __init__(self, max_in_flight: int = 0, limiter: Optional[TokenBucketLimiter] = None):
+        self.max_in_flight = max_in_flight
+        self.limiter = limiter
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = {OVERLOADED: 0, RATE_LIMITED: 0}
+
+    def admit(self, client: Optional[str]) -> Optional[str]:
+        """None if admitted, otherwise why the callback is shed"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            reason = OVERLOADED
+        elif self.limiter is not None and client and not self.limiter.allow(client):
+            reason = RATE_LIMITED
+        else:
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+        self.shed[reason] += 1
+        return reason
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "tracked_clients": len(self.limiter) if self.limiter is not None else 0,
+        }
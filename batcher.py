@@ -0,0 +1,124 @@
+"""
+Batched webhook delivery
+Collects webhooks for a short window and sends them as one bulk request
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from logging_setup import log_event
+
+logger = logging.getLogger(__name__)
+
+SendBatch = Callable[[list], Awaitable[list]]
+
+
+class WebhookBatchError(Exception):
+    """The bulk endpoint did not acknowledge an item of the batch"""
+
+
+class WebhookBatcher:
+    """
+    Coalesce concurrent webhook submissions into bulk requests
+
+    Items are collected until ``max_size`` items are waiting or ``window``
+    seconds have passed since the first one, then sent together. Each caller
+    of ``submit`` receives the acknowledgement for its own item, matched by
+    ``trackId``. Batches are sent concurrently, so a slow bulk request does
+    not hold up collection of the next one.
+    """
+
+    def __init__(self, send_batch: SendBatch, max_size: int = 50, window: float = 0.02):
+        self._send_batch = send_batch
+        self.max_size = max_size
+        self.window = window
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._collector: Optional[asyncio.Task] = None
+        self._inflight: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        """Start collecting submissions"""
+        self._collector = asyncio.create_task(self._collect(), name="webhook-batcher")
+
+    async def stop(self) -> None:
+        """Flush pending items, wait for in-flight batches and stop collecting"""
+        if self._collector is not None:
+            self._collector.cancel()
+            await asyncio.gather(self._collector, return_exceptions=True)
+            self._collector = None
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for start in range(0, len(pending), self.max_size):
+            self._spawn(pending[start:start + self.max_size])
+        await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def submit(self, webhook_data: dict) -> dict:
+        """Queue a webhook for the next batch and return its acknowledgement"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((webhook_data, future))
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            try:
+                while len(batch) < self.max_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            finally:
+                # Also runs on cancellation, so a half-collected batch is still sent
+                self._spawn(batch)
+
+    def _spawn(self, batch: list) -> None:
+        task = asyncio.create_task(self._flush(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _flush(self, batch: list) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self._send_batch([item for item, _ in batch])
+        except Exception as e:
+            self.errors += 1
+            log_event(
+                logger, logging.ERROR, "webhook_batch.failed",
+                items=len(batch), error=str(e)
+            )
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        acks = {str(result.get("trackId")): result for result in results}
+        for item, future in batch:
+            if future.done():
+                continue
+            ack = acks.get(str(item.get("trackId")))
+            if ack is None:
+                future.set_exception(WebhookBatchError(
+                    f"No acknowledgement for trackId {item.get('trackId')}"
+                ))
+            else:
+                future.set_result(ack)
+
+    def stats(self) -> dict:
+        """Batch counters"""
+        return {
+            "batches": self.batches,
+            "batched_items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "batch_errors": self.errors,
+        }
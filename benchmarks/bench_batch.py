@@ -0,0 +1,94 @@
+"""
+Batched webhook delivery benchmark
+
+Sends verified-payment webhooks to a local ticketing stub, once with
+single-item POSTs and then through WebhookBatcher at several batch sizes.
+Reports throughput, caller-observed latency and upstream request counts.
+
+Usage:
+    python benchmarks/bench_batch.py --webhooks 5000 --concurrency 500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = 8766
+os.environ.setdefault("TICKETING_API_URL", f"http://127.0.0.1:{PORT}")
+os.environ.setdefault("TICKETING_FRONTEND_URL", "http://frontend.local")
+os.environ.setdefault("WEBHOOK_SECRET", "benchmark-secret")
+
+import httpx  # noqa: E402
+
+from batcher import WebhookBatcher  # noqa: E402
+from stubs import StubServer, TicketingStub, percentile  # noqa: E402
+from webhooks import build_webhook_data, send_webhook, send_webhook_batch  # noqa: E402
+
+
+async def run(stub: TicketingStub, batch_size: int, args) -> dict:
+    stub.requests = stub.items = 0
+    client = httpx.AsyncClient(limits=httpx.Limits(max_connections=100))
+    batcher = None
+    if batch_size > 1:
+        batcher = WebhookBatcher(
+            send_batch=lambda items: send_webhook_batch(client, items),
+            max_size=batch_size,
+            window=args.window_ms / 1000,
+        )
+        batcher.start()
+        deliver = batcher.submit
+    else:
+        deliver = lambda data: send_webhook(client, data)  # noqa: E731
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one(track_id: int):
+        data = build_webhook_data(str(track_id), 1, 2, None, {"result": 100})
+        async with semaphore:
+            started = time.perf_counter()
+            ack = await deliver(data)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert ack["trackId"] == str(track_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.webhooks)))
+    elapsed = time.perf_counter() - started
+    if batcher is not None:
+        await batcher.stop()
+    await client.aclose()
+
+    return {
+        "batch_size": batch_size,
+        "webhooks_per_s": round(args.webhooks / elapsed),
+        "upstream_requests": stub.requests,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def main(args) -> None:
+    stub = TicketingStub(request_ms=args.request_ms, item_ms=args.item_ms)
+    async with StubServer(stub, PORT):
+        print(f"{'batch':>8}{'webhooks/s':>12}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for batch_size in args.batch_sizes:
+            row = await run(stub, batch_size, args)
+            print(
+                f"{row['batch_size']:>8}{row['webhooks_per_s']:>12}"
+                f"{row['upstream_requests']:>10}{row['p50_ms']:>10}{row['p99_ms']:>10}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--webhooks", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--window-ms", type=float, default=20.0)
+    parser.add_argument("--request-ms", type=float, default=5.0)
+    parser.add_argument("--item-ms", type=float, default=0.2)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 50, 200])
+    asyncio.run(main(parser.parse_args()))
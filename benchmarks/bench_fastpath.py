@@ -0,0 +1,115 @@
+"""
+ASGI fast path benchmark for /health and /redirect/{trackId}
+
+Calls main:app directly as an ASGI application (no sockets, so only the
+application's own per-request cost is measured), once with FAST_PATH_ENABLED
+and once without, and reports requests per second for each route. Each mode
+runs in its own interpreter because the setting is read at import time.
+
+Usage:
+    python benchmarks/bench_fastpath.py --requests 50000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+ROUTES = {"health": "/health", "redirect": "/redirect/3714615290"}
+
+
+async def drive(app, path: str, requests: int) -> float:
+    """Requests per second for ``requests`` sequential GETs of ``path``"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"proxy.local"), (b"user-agent", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    # Warm up (also builds the middleware stack)
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+    statuses.clear()
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    elapsed = time.perf_counter() - started
+    assert set(statuses) <= {200, 303}, set(statuses)
+    return requests / elapsed
+
+
+def child(args) -> None:
+    sys.path.insert(0, REPO_ROOT)
+    import main
+
+    results = {
+        name: asyncio.run(drive(main.app, path, args.requests))
+        for name, path in ROUTES.items()
+    }
+    print(json.dumps(results))
+
+
+def run_mode(enabled: bool, args) -> dict:
+    env = dict(
+        os.environ,
+        FAST_PATH_ENABLED=str(enabled).lower(),
+        TICKETING_API_URL="http://ticketing.bench",
+        TICKETING_FRONTEND_URL="http://frontend.bench",
+        WEBHOOK_SECRET="bench-secret",
+        LOG_LEVEL=args.log_level,
+    )
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--requests", str(args.requests)],
+        env=env, cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    # The app's JSON logs may share stdout; the results are the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(args) -> None:
+    if args.child:
+        child(args)
+        return
+    routed = run_mode(False, args)
+    fast = run_mode(True, args)
+    print(f"{'route':<10}{'FastAPI req/s':>15}{'fast path req/s':>17}{'speedup':>9}")
+    for name in ROUTES:
+        print(
+            f"{name:<10}{routed[name]:>15.0f}{fast[name]:>17.0f}"
+            f"{fast[name] / routed[name]:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument(
+        "--log-level", default="WARNING",
+        help="app LOG_LEVEL (INFO includes the gateway.redirect record)"
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    main(parser.parse_args())
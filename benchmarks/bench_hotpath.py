@@ -0,0 +1,190 @@
+"""
+Hot-path microbenchmarks with regression thresholds
+
+Times the per-request CPU work of the callback and redirect handlers in
+isolation: signing, redirect URL construction, RedirectResponse creation,
+FastAPI query-parameter validation for the callback signature, and the
+structured logging calls. Each case is compared with the stored baseline in
+benchmarks/baselines/hotpath.json, and the run fails when a case is slower
+than its baseline by more than the threshold on two measurements.
+
+Timings are normalized by a fixed pure-Python calibration loop, measured
+alternately with each case, so a baseline recorded on one machine stays
+usable on another. Logging is measured up to the queue hand-off, which is
+the part paid by the request; the listener thread is not running.
+
+Usage:
+    python benchmarks/bench_hotpath.py              # compare with baselines
+    python benchmarks/bench_hotpath.py --update     # record new baselines
+    python benchmarks/bench_hotpath.py --threshold 0.15 --only signature
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import timeit
+from collections import deque
+
+os.environ.setdefault("TICKETING_API_URL", "http://ticketing.bench")
+os.environ.setdefault("TICKETING_FRONTEND_URL", "http://frontend.bench")
+os.environ.setdefault("WEBHOOK_SECRET", "bench-secret")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fastapi import status as http_status  # noqa: E402
+from fastapi.dependencies.utils import get_dependant, request_params_to_args  # noqa: E402
+from fastapi.responses import RedirectResponse  # noqa: E402
+from starlette.datastructures import QueryParams  # noqa: E402
+
+import main  # noqa: E402
+from logging_setup import DeferredQueueHandler, log_event  # noqa: E402
+from webhooks import build_webhook_data, create_signature  # noqa: E402
+
+BASELINES = os.path.join(BENCH_DIR, "baselines", "hotpath.json")
+TRACK_ID = "3714615290"
+VERIFY_RESULT = {"result": 100, "message": "success", "refNumber": 41256941}
+WEBHOOK_RESULT = {"success": True, "ref_number": "R1", "reservation_id": 7}
+
+
+class RecordSink:
+    """Stand-in for the log queue that keeps only the latest records"""
+
+    def __init__(self, maxlen: int = 1024):
+        self.put_nowait = deque(maxlen=maxlen).append
+
+
+def calibration() -> int:
+    # Fixed interpreter workload used to normalize timings across machines
+    total = 0
+    for i in range(100):
+        total += i * i % 7
+    return total
+
+
+def build_cases() -> dict:
+    """name -> zero-argument callable doing one unit of hot-path work"""
+    data = build_webhook_data(TRACK_ID, 1, 2, "ORD-7", VERIFY_RESULT)
+    callback_query = QueryParams(f"trackId={TRACK_ID}&success=1&status=2&orderId=ORD-7")
+    query_fields = get_dependant(
+        path="/api/zibal/callback", call=main.zibal_callback
+    ).query_params
+
+    logger = logging.getLogger("bench.hotpath")
+    logger.handlers[:] = [DeferredQueueHandler(RecordSink())]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    return {
+        "calibration": calibration,
+        "signature": lambda: create_signature(data),
+        "success_url": lambda: main.success_redirect_url(TRACK_ID, WEBHOOK_RESULT),
+        "failed_url": lambda: main.failed_redirect_url(TRACK_ID, VERIFY_RESULT),
+        "redirect_response": lambda: RedirectResponse(
+            url="http://frontend.bench/payment/success?ref_id=R1&reservation_id=7",
+            status_code=http_status.HTTP_303_SEE_OTHER
+        ),
+        "callback_query_validation": lambda: request_params_to_args(
+            query_fields, callback_query
+        ),
+        "log_event_info": lambda: log_event(
+            logger, logging.INFO, "callback.complete",
+            trackId=TRACK_ID, success=1, status=2, orderId="ORD-7",
+            target="success", redirect="http://frontend.bench/payment/success",
+            duration_ms=12.5
+        ),
+        "log_event_disabled": lambda: log_event(
+            logger, logging.DEBUG, "callback.cache_hit", trackId=TRACK_ID
+        ),
+    }
+
+
+def calls_for(timer: timeit.Timer, min_time: float) -> int:
+    number, elapsed = timer.autorange()
+    return max(number, int(number * min_time / max(elapsed, 1e-9)))
+
+
+def measure(fn, reference, min_time: float, repeat: int = 7) -> tuple[float, float]:
+    """
+    Best per-call time in ns of ``fn`` and of ``reference``
+
+    The two are timed alternately, so both see the same machine load.
+    """
+    timer, reference_timer = timeit.Timer(fn), timeit.Timer(reference)
+    number = calls_for(timer, min_time)
+    reference_number = calls_for(reference_timer, min_time)
+    best = reference_best = float("inf")
+    for _ in range(repeat):
+        reference_best = min(reference_best, reference_timer.timeit(reference_number))
+        best = min(best, timer.timeit(number))
+    return best / number * 1e9, reference_best / reference_number * 1e9
+
+
+def main_(args) -> int:
+    cases = build_cases()
+    names = [name for name in cases if name != "calibration"]
+    if args.only:
+        names = [name for name in names if any(part in name for part in args.only)]
+
+    # name -> (ns per call, ns per calibration run)
+    timings = {
+        name: measure(cases[name], cases["calibration"], args.min_time)
+        for name in names
+    }
+    calibration_ns = min(reference for _, reference in timings.values())
+
+    if args.update:
+        baselines = {"calibration_ns": round(calibration_ns, 1), "cases": {}}
+        if os.path.exists(BASELINES):
+            with open(BASELINES) as f:
+                baselines["cases"] = json.load(f).get("cases", {})
+        baselines["cases"].update(
+            {name: round(ns / reference, 4) for name, (ns, reference) in timings.items()}
+        )
+        os.makedirs(os.path.dirname(BASELINES), exist_ok=True)
+        with open(BASELINES, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baselines written to {BASELINES}")
+
+    stored = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            stored = json.load(f).get("cases", {})
+
+    print(f"calibration: {calibration_ns:.0f} ns\n")
+    print(f"{'case':<28}{'ns/op':>10}{'baseline':>10}{'change':>9}")
+    regressions = []
+    for name, (ns, reference) in timings.items():
+        relative = ns / reference
+        baseline = stored.get(name)
+        if baseline is None:
+            print(f"{name:<28}{ns:>10.0f}{'-':>10}{'new':>9}")
+            continue
+        change = relative / baseline - 1
+        if change > args.threshold:
+            # Confirm with a second measurement before calling it a regression
+            ns, reference = measure(cases[name], cases["calibration"], args.min_time)
+            change = min(change, ns / reference / baseline - 1)
+        flag = ""
+        if change > args.threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28}{ns:>10.0f}{baseline * reference:>10.0f}{change:>+9.1%}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--update", action="store_true", help="record new baselines")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown ratio")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--only", nargs="+", help="run cases whose name contains any of these")
+    sys.exit(main_(parser.parse_args()))
@@ -0,0 +1,124 @@
+"""
+HTTP/1.1 vs HTTP/2 upstream benchmark
+
+Starts a local h2c stub (hypercorn) that imitates Zibal verify and fires
+bursts of concurrent POSTs through a pooled httpx client, once per protocol.
+Reports p50/p99 latency and the number of sockets the server saw.
+
+Usage:
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/bench_http2.py --requests 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from stubs import percentile
+
+
+class VerifyStub:
+    """ASGI app answering like Zibal /v1/verify and recording client sockets"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.sockets = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        self.sockets.add(tuple(scope["client"]))
+        while True:
+            message = await receive()
+            if not message.get("more_body"):
+                break
+        await asyncio.sleep(self.latency)
+        body = json.dumps({"result": 100, "message": "success"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def run_protocol(url: str, stub: VerifyStub, http2: bool, args) -> dict:
+    """Drive the stub with one protocol and collect latency and socket stats"""
+    stub.sockets.clear()
+    limits = httpx.Limits(
+        max_connections=args.max_connections,
+        max_keepalive_connections=args.max_connections,
+    )
+    # http1=False forces HTTP/2 with prior knowledge on the plain-text stub
+    client = httpx.AsyncClient(limits=limits, http1=not http2, http2=http2)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one(track_id: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                url, json={"merchant": "zibal", "trackId": track_id}, timeout=30.0
+            )
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    async with client:
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "protocol": "HTTP/2" if http2 else "HTTP/1.1",
+        "requests": args.requests,
+        "rps": round(args.requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "sockets": len(stub.sockets),
+    }
+
+
+async def main(args) -> None:
+    stub = VerifyStub(latency=args.latency_ms / 1000)
+    config = Config()
+    config.bind = [f"127.0.0.1:{args.port}"]
+    config.loglevel = "WARNING"
+    config.h2_max_concurrent_streams = args.concurrency
+    shutdown = asyncio.Event()
+    server = asyncio.create_task(serve(stub, config, shutdown_trigger=shutdown.wait))
+    await asyncio.sleep(0.5)
+
+    url = f"http://127.0.0.1:{args.port}/v1/verify"
+    results = []
+    for http2 in (False, True):
+        results.append(await run_protocol(url, stub, http2, args))
+
+    shutdown.set()
+    await server
+
+    print(f"{'protocol':<10}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'sockets':>10}")
+    for row in results:
+        print(
+            f"{row['protocol']:<10}{row['rps']:>10}{row['p50_ms']:>10}"
+            f"{row['p99_ms']:>10}{row['sockets']:>10}"
+        )
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", action="store_true", help="Also print JSON results")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+"""
+Import-time benchmark for main:app with a startup budget
+
+Imports main in fresh interpreters with ``-X importtime`` and reports the
+median total import time and the slowest modules. Exits non-zero when the
+median exceeds the budget, or when a module that should only be imported
+lazily (``--lazy``, by default scalar_fastapi and redis) is imported at startup.
+
+Usage:
+    python benchmarks/bench_import.py --runs 5 --budget-ms 1500
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> dict:
+    """module -> (self us, cumulative us) from one ``-X importtime`` run"""
+    env = dict(
+        os.environ,
+        TICKETING_API_URL="http://ticketing.bench",
+        TICKETING_FRONTEND_URL="http://frontend.bench",
+        WEBHOOK_SECRET="bench-secret",
+        LOG_LEVEL="WARNING",
+    )
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main(args) -> int:
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    totals = [run[args.module][1] / 1000 for run in runs]
+    median_ms = statistics.median(totals)
+
+    last = runs[-1]
+    print(f"import {args.module}: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}), {len(last)} modules\n")
+    print(f"{'module':<44}{'self ms':>9}{'cumulative ms':>15}")
+    slowest = sorted(last.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[:args.top]:
+        print(f"{name:<44}{self_us / 1000:>9.1f}{cumulative_us / 1000:>15.1f}")
+
+    failed = False
+    eager = [name for name in args.lazy if name in last]
+    if eager:
+        print(f"\nimported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"\nimport time {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    elif not eager:
+        print(f"\nwithin the {args.budget_ms:.0f} ms budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--lazy", nargs="*", default=["scalar_fastapi", "redis"])
+    sys.exit(main(parser.parse_args()))
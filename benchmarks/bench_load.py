@@ -0,0 +1,316 @@
+"""
+End-to-end load test of one main:app instance against local stub upstreams
+
+Starts Zibal verify and ticketing stubs in one process and main:app under
+uvicorn in another, then drives /api/zibal/callback and /redirect/{trackId}
+at a fixed concurrency. Reports throughput, p50/p95/p99/p999 latency and the
+peak socket count and RSS of the app process, and writes everything to a
+JSON file so runs can be compared over time.
+
+Extra settings for the app (e.g. WEBHOOK_DELIVERY_MODE=async) are taken from
+the environment. Admission control is off unless ADMISSION_MAX_IN_FLIGHT or
+ADMISSION_CLIENT_RATE is set there, since every simulated payer shares one
+address. Outcomes are counted by target page, so shed (retry, 503) and
+pending responses never pass for completed payments.
+
+Usage:
+    python benchmarks/bench_load.py --requests 5000 --concurrency 100
+    python benchmarks/bench_load.py --zibal-ms 80 --zibal-jitter-ms 40 \\
+        --zibal-error-rate 0.01 --ticketing-error-rate 0.01 --output run.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from stubs import StubServer, TicketingStub, ZibalStub, percentile  # noqa: E402
+
+HOST = "127.0.0.1"
+FRONTEND_URL = "http://frontend.local"
+
+
+def serve_stubs(args) -> None:
+    """Stub process: serve both upstream stubs until terminated"""
+    zibal = ZibalStub(
+        latency_ms=args.zibal_ms,
+        jitter_ms=args.zibal_jitter_ms,
+        error_rate=args.zibal_error_rate,
+        failure_rate=args.zibal_failure_rate,
+        shape=args.zibal_shape,
+    )
+    ticketing = TicketingStub(
+        request_ms=args.ticketing_ms,
+        db_connections=args.ticketing_connections,
+        error_rate=args.ticketing_error_rate,
+    )
+
+    async def run() -> None:
+        async with StubServer(zibal, args.zibal_port), StubServer(ticketing, args.ticketing_port):
+            await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def start_app(args) -> subprocess.Popen:
+    # Admission control stays off unless set in the environment (see above)
+    env = {"ADMISSION_MAX_IN_FLIGHT": "0", "ADMISSION_CLIENT_RATE": "0", **os.environ}
+    env.update(
+        ZIBAL_VERIFY_URL=f"http://{HOST}:{args.zibal_port}/v1/verify",
+        TICKETING_API_URL=f"http://{HOST}:{args.ticketing_port}",
+        TICKETING_FRONTEND_URL=FRONTEND_URL,
+        WEBHOOK_SECRET=os.environ.get("WEBHOOK_SECRET", "benchmark-secret"),
+        LOG_LEVEL=args.app_log_level,
+    )
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", HOST, "--port", str(args.app_port),
+            "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(url: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("main:app did not become ready")
+            await asyncio.sleep(0.1)
+
+
+def process_stats(pid: int) -> Optional[dict]:
+    """RSS (MiB) and open socket count of a process, from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            rss_kib = next(
+                int(line.split()[1]) for line in status if line.startswith("VmRSS:")
+            )
+        sockets = 0
+        for fd in os.listdir(f"/proc/{pid}/fd"):
+            try:
+                sockets += os.readlink(f"/proc/{pid}/fd/{fd}").startswith("socket:")
+            except OSError:
+                pass
+    except (OSError, StopIteration):
+        return None
+    return {"rss_mib": round(rss_kib / 1024, 1), "sockets": sockets}
+
+
+class ProcessSampler:
+    """Track the peak RSS and socket count of a process while a scenario runs"""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss_mib = 0.0
+        self.peak_sockets = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> None:
+        stats = process_stats(self.pid)
+        if stats is not None:
+            self.peak_rss_mib = max(self.peak_rss_mib, stats["rss_mib"])
+            self.peak_sockets = max(self.peak_sockets, stats["sockets"])
+
+    async def _run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self) -> "ProcessSampler":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._task.cancel()
+        self.sample()
+
+
+def classify(scenario: str, response: httpx.Response) -> str:
+    """Outcome of one request; only completed payments and gateway redirects are ok"""
+    if response.status_code != 303:
+        return f"status:{response.status_code}"
+    location = response.headers.get("location", "")
+    if scenario == "redirect" or "/payment/success" in location:
+        return "redirect:ok"
+    for page in ("failed", "pending", "retry"):
+        if f"/payment/{page}" in location:
+            return f"redirect:{page}"
+    # A custom ADMISSION_RETRY_URL
+    return "redirect:other"
+
+
+async def run_scenario(name: str, client: httpx.AsyncClient, pid: int, args, first_id: int) -> dict:
+    if name == "callback":
+        def request_url(track_id: int) -> str:
+            return f"/api/zibal/callback?trackId={track_id}&success=1&status=2&orderId=ORD-{track_id}"
+    else:
+        def request_url(track_id: int) -> str:
+            return f"/redirect/{track_id}"
+
+    latencies = []
+    ok_latencies = []
+    outcomes = Counter()
+    next_id = iter(range(first_id, first_id + args.requests))
+
+    async def worker() -> None:
+        for track_id in next_id:
+            started = time.perf_counter()
+            try:
+                response = await client.get(request_url(track_id))
+            except httpx.HTTPError as e:
+                outcomes[f"error:{type(e).__name__}"] += 1
+                continue
+            latency = (time.perf_counter() - started) * 1000
+            latencies.append(latency)
+            outcome = classify(name, response)
+            outcomes[outcome] += 1
+            if outcome == "redirect:ok":
+                ok_latencies.append(latency)
+
+    with ProcessSampler(pid) as sampler:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "scenario": name,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(args.requests / elapsed, 1),
+        "ok_per_s": round(len(ok_latencies) / elapsed, 1),
+        "outcomes": dict(outcomes),
+        "peak_rss_mib": sampler.peak_rss_mib,
+        "peak_sockets": sampler.peak_sockets,
+    }
+    if latencies:
+        for label, pct in (("p50", 50), ("p95", 95), ("p99", 99), ("p999", 99.9)):
+            result[f"{label}_ms"] = round(percentile(latencies, pct), 2)
+    if ok_latencies:
+        result["ok_p50_ms"] = round(percentile(ok_latencies, 50), 2)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def drive(app: subprocess.Popen, args) -> list:
+    app_url = f"http://{HOST}:{args.app_port}"
+    await wait_ready(app_url)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = []
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=60.0) as client:
+        # Warm up connections and the app's upstream pools
+        warmup = argparse.Namespace(**{**vars(args), "requests": args.warmup})
+        for name in args.scenarios:
+            await run_scenario(name, client, app.pid, warmup, first_id=10_000_000)
+        for index, name in enumerate(args.scenarios):
+            results.append(
+                await run_scenario(name, client, app.pid, args, first_id=1 + index * args.requests)
+            )
+    return results
+
+
+def main(args) -> None:
+    stubs = multiprocessing.Process(target=serve_stubs, args=(args,), daemon=True)
+    stubs.start()
+    app = start_app(args)
+    try:
+        results = asyncio.run(drive(app, args))
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        stubs.terminate()
+        stubs.join(timeout=10)
+
+    print(
+        f"{'scenario':<10}{'req/s':>10}{'ok/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'p999 ms':>9}{'sockets':>9}{'RSS MiB':>9}  outcomes"
+    )
+    for row in results:
+        print(
+            f"{row['scenario']:<10}{row['requests_per_s']:>10}{row['ok_per_s']:>10}"
+            f"{row.get('p50_ms', '-'):>9}"
+            f"{row.get('p95_ms', '-'):>9}{row.get('p99_ms', '-'):>9}{row.get('p999_ms', '-'):>9}"
+            f"{row['peak_sockets']:>9}{row['peak_rss_mib']:>9}  {row['outcomes']}"
+        )
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "app_env": {
+            key: value for key, value in os.environ.items()
+            if key.startswith(
+                ("WEBHOOK_", "HTTP_", "OUTBOX_", "BREAKER_", "RETRY_", "ADMISSION_", "CALLBACK_")
+            )
+            and key != "WEBHOOK_SECRET"
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"load-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=["callback", "redirect"],
+        default=["callback", "redirect"]
+    )
+    parser.add_argument("--app-port", type=int, default=8770)
+    parser.add_argument("--zibal-port", type=int, default=8771)
+    parser.add_argument("--ticketing-port", type=int, default=8772)
+    parser.add_argument("--app-log-level", default="INFO")
+    parser.add_argument("--zibal-ms", type=float, default=20.0)
+    parser.add_argument("--zibal-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--zibal-error-rate", type=float, default=0.0)
+    parser.add_argument("--zibal-failure-rate", type=float, default=0.0)
+    parser.add_argument("--zibal-shape", choices=["full", "minimal"], default="full")
+    parser.add_argument("--ticketing-ms", type=float, default=5.0)
+    parser.add_argument("--ticketing-connections", type=int, default=20)
+    parser.add_argument("--ticketing-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/)")
+    main(parser.parse_args())
@@ -0,0 +1,144 @@
+"""
+Logging cost per callback: legacy banner logs vs queued structured events
+
+Replays the log calls one successful callback used to make (about fifteen
+synchronous f-string records through a StreamHandler) and the three
+structured events it makes now (through the queue handler, written as JSON
+by a listener thread), both at INFO. Reports the time spent on the calling
+thread, which is what the event loop pays, and the time until the listener
+has written everything out.
+
+Usage:
+    python benchmarks/bench_logging.py --callbacks 20000
+"""
+
+import argparse
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueListener
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_setup import DeferredQueueHandler, JsonFormatter, log_event  # noqa: E402
+
+TRACK_ID = "3714615290"
+VERIFY_DATA = {"merchant": "zibal", "trackId": int(TRACK_ID)}
+VERIFY_RESULT = {
+    "paidAt": "2024-01-01T12:00:00.000000",
+    "amount": 1500000,
+    "result": 100,
+    "status": 1,
+    "refNumber": 41256941,
+    "description": "Reservation 7",
+    "cardNumber": "62741****44",
+    "orderId": "ORD-7",
+    "message": "success",
+}
+WEBHOOK_RESULT = {"success": True, "ref_number": "R1", "reservation_id": 7}
+REDIRECT_URL = "https://front.example.com/payment/success?ref_id=R1&reservation_id=7"
+
+
+def legacy_callback(logger: logging.Logger) -> None:
+    logger.info("="*100)
+    logger.info("🔔 ZIBAL CALLBACK RECEIVED AT PROXY")
+    logger.info(f"📋 Parameters:")
+    logger.info(f"   - trackId: {TRACK_ID}")
+    logger.info(f"   - success: {1}")
+    logger.info(f"   - status: {2}")
+    logger.info(f"   - orderId: {'ORD-7'}")
+    logger.info("="*100)
+    logger.info("🔄 Verifying payment with Zibal...")
+    logger.info(f"📤 Sending verify request: {VERIFY_DATA}")
+    logger.info(f"📥 Zibal verify response: {VERIFY_RESULT}")
+    logger.info("📨 Forwarding to ticketing API...")
+    logger.info(f"✅ Ticketing API response: {WEBHOOK_RESULT}")
+    logger.info("🎉 Payment successful - redirecting to success page")
+    logger.info(f"🔀 Redirecting to: {REDIRECT_URL}")
+    logger.info("="*100)
+
+
+def structured_callback(logger: logging.Logger) -> None:
+    log_event(
+        logger, logging.INFO, "callback.verify",
+        trackId=TRACK_ID, result=100, verified=True, attempts=1, duration_ms=182.4
+    )
+    log_event(
+        logger, logging.INFO, "callback.webhook",
+        trackId=TRACK_ID, delivery="inline", success=True, duration_ms=96.1
+    )
+    log_event(
+        logger, logging.INFO, "callback.complete",
+        trackId=TRACK_ID, success=1, status=2, orderId="ORD-7",
+        target="success", redirect=REDIRECT_URL, duration_ms=281.0
+    )
+    # Disabled at INFO: costs one level check
+    log_event(
+        logger, logging.DEBUG, "zibal.verify_response",
+        trackId=TRACK_ID, body=VERIFY_RESULT
+    )
+
+
+def isolated_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f"bench.{name}")
+    logger.handlers[:] = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def run_legacy(callbacks: int, sink) -> tuple[float, float]:
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    logger = isolated_logger("legacy", handler)
+    started = time.perf_counter()
+    for _ in range(callbacks):
+        legacy_callback(logger)
+    elapsed = time.perf_counter() - started
+    # Synchronous: everything is already written when the calls return
+    return elapsed, elapsed
+
+
+def run_structured(callbacks: int, sink) -> tuple[float, float]:
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler(sink)
+    output.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, output)
+    logger = isolated_logger("structured", DeferredQueueHandler(log_queue))
+    listener.start()
+    started = time.perf_counter()
+    for _ in range(callbacks):
+        structured_callback(logger)
+    caller = time.perf_counter() - started
+    listener.stop()
+    return caller, time.perf_counter() - started
+
+
+def main(args) -> None:
+    with open(args.output, "w", encoding="utf-8") as sink:
+        results = {
+            "legacy banner logs": run_legacy(args.callbacks, sink),
+            "queued structured": run_structured(args.callbacks, sink),
+        }
+
+    print(f"{args.callbacks} callbacks at INFO, output to {args.output}\n")
+    print(f"{'pipeline':<22}{'caller us/callback':>20}{'drained us/callback':>21}")
+    for name, (caller, drained) in results.items():
+        print(
+            f"{name:<22}{caller / args.callbacks * 1e6:>20.1f}"
+            f"{drained / args.callbacks * 1e6:>21.1f}"
+        )
+    legacy_caller = results["legacy banner logs"][0]
+    structured_caller = results["queued structured"][0]
+    print(f"\ncaller-side speedup: {legacy_caller / structured_caller:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--callbacks", type=int, default=20000)
+    parser.add_argument("--output", default=os.devnull)
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+"""
+Webhook outbox write throughput benchmark
+
+Simulates a callback burst: many concurrent ``WebhookOutbox.add`` calls, each
+awaiting its durable commit. Reports writes per second, commit count and
+add() latency percentiles for several group-commit batch sizes.
+
+Usage:
+    python benchmarks/bench_outbox.py --writes 20000 --concurrency 500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import WebhookOutbox  # noqa: E402
+from stubs import percentile  # noqa: E402
+
+
+def payload(track_id: int) -> dict:
+    """Webhook body shaped like a real verified payment"""
+    return {
+        "trackId": str(track_id),
+        "success": 1,
+        "status": 2,
+        "orderId": f"order-{track_id}",
+        "verifyResult": {
+            "result": 100,
+            "message": "success",
+            "amount": 1500000,
+            "refNumber": 123456789,
+            "cardNumber": "62741****44",
+            "paidAt": "2024-01-01T12:00:00",
+        },
+        "timestamp": "2024-01-01T12:00:01",
+    }
+
+
+async def run(batch_size: int, args) -> dict:
+    async def noop(_):
+        return {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = WebhookOutbox(
+            path=os.path.join(tmp, "outbox.db"),
+            deliver=noop,
+            batch_size=batch_size,
+            batch_window=args.window_ms / 1000,
+        )
+        await outbox.start(dispatch=False)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+
+        async def one(track_id: int):
+            async with semaphore:
+                started = time.perf_counter()
+                await outbox.add(payload(track_id))
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.writes)))
+        elapsed = time.perf_counter() - started
+        stats = outbox.stats()
+        await outbox.stop()
+
+    return {
+        "batch_size": batch_size,
+        "writes_per_s": round(args.writes / elapsed),
+        "commits": stats["commits"],
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def main(args) -> None:
+    print(f"{'batch':>8}{'writes/s':>12}{'commits':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for batch_size in args.batch_sizes:
+        row = await run(batch_size, args)
+        print(
+            f"{row['batch_size']:>8}{row['writes_per_s']:>12}{row['commits']:>10}"
+            f"{row['p50_ms']:>10}{row['p99_ms']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writes", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 16, 64, 256]
+    )
+    asyncio.run(main(parser.parse_args()))
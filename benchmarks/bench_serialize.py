@@ -0,0 +1,98 @@
+"""
+Webhook request building microbenchmark
+
+Compares building the ticketing webhook request the old way (v1 signature
+over trackId:success:status, then httpx serializes ``json=`` with the stdlib
+encoder) with the serialize-once path (encode the body to bytes once, sign
+the timestamp and those bytes, send them as ``content=``), using the stdlib
+encoder and orjson.
+
+Usage:
+    python benchmarks/bench_serialize.py --iterations 100000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+os.environ.setdefault("TICKETING_API_URL", "http://ticketing.bench")
+os.environ.setdefault("TICKETING_FRONTEND_URL", "http://frontend.bench")
+os.environ.setdefault("WEBHOOK_SECRET", "bench-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+import webhooks  # noqa: E402
+from webhooks import (  # noqa: E402
+    build_webhook_data,
+    signature_message,
+    signer,
+    timestamped_signature_headers,
+)
+
+URL = "http://ticketing.bench/api/v1/payments/zibal-webhook"
+VERIFY_RESULT = {
+    "paidAt": "2024-01-01T12:00:00.000000",
+    "amount": 1500000,
+    "result": 100,
+    "status": 1,
+    "refNumber": 41256941,
+    "description": "رزرو بلیت شماره ۷",
+    "cardNumber": "62741****44",
+    "orderId": "ORD-7",
+    "message": "success",
+}
+
+
+def main(args) -> None:
+    data = build_webhook_data("3714615290", 1, 2, "ORD-7", VERIFY_RESULT)
+    orjson = webhooks.orjson
+
+    def legacy_request() -> httpx.Request:
+        return httpx.Request(
+            "POST", URL, json=data,
+            headers={
+                "Content-Type": "application/json",
+                **signer.headers(signature_message(data))
+            }
+        )
+
+    def serialize_once_request() -> httpx.Request:
+        body = webhooks.encode_json(data)
+        return httpx.Request(
+            "POST", URL, content=body,
+            headers={
+                "Content-Type": "application/json",
+                **timestamped_signature_headers(body)
+            }
+        )
+
+    def stdlib_request() -> httpx.Request:
+        webhooks.orjson = None
+        try:
+            return serialize_once_request()
+        finally:
+            webhooks.orjson = orjson
+
+    cases = {
+        "json= + v1 signature": legacy_request,
+        "serialize once (stdlib)": stdlib_request,
+    }
+    if orjson is not None:
+        cases["serialize once (orjson)"] = serialize_once_request
+    else:
+        print("orjson is not installed; skipping the orjson case\n")
+
+    print(f"{'request building':<28}{'us/request':>12}{'body bytes':>12}")
+    for name, build in cases.items():
+        best = min(timeit.repeat(build, number=args.iterations, repeat=5))
+        size = len(build().read())
+        print(f"{name:<28}{best / args.iterations * 1e6:>12.2f}{size:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=100000)
+    main(parser.parse_args())
@@ -0,0 +1,95 @@
+"""
+Webhook signing microbenchmark
+
+Compares the previous create_signature (encode the secret and key a fresh
+HMAC on every call) with WebhookSigner, which copies a pre-keyed context,
+for the short trackId:success:status message and for a full webhook body.
+Per-call costs are also shown as the CPU share they take at a given
+webhook rate.
+
+Usage:
+    python benchmarks/bench_signing.py --iterations 200000 --rate 2000
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from signing import WebhookSigner  # noqa: E402
+
+SECRET = "5f2b6c0e9d8a4b1f7e3c2a9d6b0f8e4c1a7d3b5e9f2c6a0d8b4e1f7c3a9d5b2e"
+WEBHOOK_DATA = {
+    "trackId": "3714615290",
+    "success": 1,
+    "status": 2,
+    "orderId": "ORD-7",
+    "verifyResult": {
+        "paidAt": "2024-01-01T12:00:00.000000",
+        "amount": 1500000,
+        "result": 100,
+        "status": 1,
+        "refNumber": 41256941,
+        "description": "Reservation 7",
+        "cardNumber": "62741****44",
+        "orderId": "ORD-7",
+        "message": "success",
+    },
+    "timestamp": "2024-01-01T12:00:01.000000",
+}
+
+
+def legacy_signature(data: dict) -> str:
+    # create_signature before pre-keyed contexts
+    message = f"{data['trackId']}:{data['success']}:{data['status']}"
+    return hmac.new(SECRET.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+def legacy_body_signature(body: bytes) -> str:
+    return hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def main(args) -> None:
+    signer = WebhookSigner([("default", SECRET)])
+    rotating = WebhookSigner([("k2", SECRET[::-1]), ("default", SECRET)])
+    body = json.dumps(WEBHOOK_DATA).encode()
+    data = WEBHOOK_DATA
+
+    def signer_signature(data: dict) -> str:
+        message = f"{data['trackId']}:{data['success']}:{data['status']}"
+        return signer.sign(message.encode())
+
+    assert legacy_signature(data) == signer_signature(data)
+    assert legacy_body_signature(body) == signer.sign(body)
+
+    cases = {
+        "legacy message": "legacy_signature(data)",
+        "signer message": "signer_signature(data)",
+        "legacy body": "legacy_body_signature(body)",
+        "signer body": "signer.sign(body)",
+        "signer headers (1 key)": "signer.headers(body)",
+        "signer headers (2 keys)": "rotating.headers(body)",
+    }
+    namespace = dict(locals(), legacy_signature=legacy_signature,
+                     legacy_body_signature=legacy_body_signature)
+
+    print(f"body: {len(body)} bytes, rate: {args.rate} webhooks/s\n")
+    print(f"{'operation':<26}{'us/call':>10}{'CPU at rate':>14}")
+    for name, statement in cases.items():
+        best = min(
+            timeit.repeat(statement, globals=namespace, number=args.iterations, repeat=5)
+        )
+        per_call = best / args.iterations
+        print(f"{name:<26}{per_call * 1e6:>10.2f}{per_call * args.rate * 100:>13.3f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--rate", type=int, default=2000, help="webhooks per second")
+    main(parser.parse_args())
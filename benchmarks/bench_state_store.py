@@ -0,0 +1,162 @@
+"""
+Callback state store latency benchmark
+
+Measures what a state store adds to each callback: ``begin`` plus ``finish``
+for a trackId seen for the first time, and ``begin`` alone for a repeated
+callback answered from the store. Each is timed sequentially and with
+``--concurrency`` callbacks in flight. Backends:
+
+- memory: MemoryStateStore in this process
+- shared: the runner's Unix-socket store, in its own process
+- redis: RedisStateStore against --redis-url (skipped if unreachable)
+- fakeredis: RedisStateStore on fakeredis (client and Lua cost, no network)
+
+Usage:
+    python benchmarks/bench_state_store.py --callbacks 5000 --concurrency 64
+    python benchmarks/bench_state_store.py --backends redis --redis-url redis://localhost:6379/0
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_state import SharedStateClient, serve  # noqa: E402
+from state_store import CallbackStates, MemoryStateStore, RedisStateStore  # noqa: E402
+from stubs import percentile  # noqa: E402
+
+REDIRECT_URL = "https://frontend.example/payment/success?ref_id=41256941&reservation_id=7"
+
+
+async def first_callback(states: CallbackStates, trackId: str) -> float:
+    started = time.perf_counter()
+    decision, claimed = await states.begin(trackId)
+    assert decision is None and claimed, (decision, claimed)
+    await states.finish(trackId, REDIRECT_URL)
+    return time.perf_counter() - started
+
+
+async def repeat_callback(states: CallbackStates, trackId: str) -> float:
+    started = time.perf_counter()
+    decision, _ = await states.begin(trackId)
+    assert decision == REDIRECT_URL, decision
+    return time.perf_counter() - started
+
+
+async def run_phase(fn, states: CallbackStates, track_ids: list, concurrency: int) -> list:
+    """Latencies of ``fn`` for every trackId, at most ``concurrency`` at a time"""
+    samples = []
+    pending = iter(track_ids)
+
+    async def worker() -> None:
+        for trackId in pending:
+            samples.append(await fn(states, trackId))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+async def bench_backend(name: str, store, args) -> dict:
+    states = CallbackStates(store, ttl=3600, lease_ttl=30)
+    results = {}
+    for concurrency in (1, args.concurrency):
+        # Fresh trackIds per backend and phase, so every first callback takes a lease
+        prefix = f"{name}-{concurrency}-{time.time_ns()}-"
+        track_ids = [f"{prefix}{i}" for i in range(args.callbacks)]
+        await run_phase(first_callback, states, track_ids[:200], concurrency)  # warm up
+        track_ids = track_ids[200:] or track_ids
+        started = time.perf_counter()
+        first = await run_phase(first_callback, states, track_ids, concurrency)
+        elapsed = time.perf_counter() - started
+        repeat = await run_phase(repeat_callback, states, track_ids, concurrency)
+        results[concurrency] = {
+            "first_p50": percentile(first, 50),
+            "first_p99": percentile(first, 99),
+            "repeat_p50": percentile(repeat, 50),
+            "repeat_p99": percentile(repeat, 99),
+            "callbacks_per_s": len(first) / elapsed,
+        }
+    assert states.errors == 0, f"{name}: {states.errors} store errors"
+    await store.close()
+    return results
+
+
+async def redis_store(args):
+    store = RedisStateStore(
+        url=args.redis_url, max_connections=args.redis_connections, timeout=2.0
+    )
+    try:
+        await store.client.ping()
+    except Exception as e:
+        await store.close()
+        print(f"redis: skipped, {args.redis_url} unreachable ({e})")
+        return None
+    return store
+
+
+def fake_redis_store():
+    try:
+        import fakeredis
+    except ImportError:
+        print("fakeredis: skipped, package not installed")
+        return None
+    return RedisStateStore(client=fakeredis.aioredis.FakeRedis(decode_responses=True))
+
+
+async def main(args) -> None:
+    results = {}
+    store_process = None
+    try:
+        for name in args.backends:
+            if name == "memory":
+                store = MemoryStateStore(maxsize=args.callbacks * 4)
+            elif name == "shared":
+                path = os.path.join(tempfile.gettempdir(), f"bench-state-{os.getpid()}.sock")
+                store_process = multiprocessing.Process(
+                    target=serve, args=(path, args.callbacks * 4), daemon=True
+                )
+                store_process.start()
+                while not os.path.exists(path):
+                    await asyncio.sleep(0.05)
+                store = SharedStateClient(path, timeout=2.0)
+            elif name == "redis":
+                store = await redis_store(args)
+            else:
+                store = fake_redis_store()
+            if store is not None:
+                results[name] = await bench_backend(name, store, args)
+    finally:
+        if store_process is not None:
+            store_process.terminate()
+            store_process.join(5)
+
+    print(
+        f"\n{'backend':<11}{'in flight':>10}{'first p50':>11}{'first p99':>11}"
+        f"{'repeat p50':>12}{'repeat p99':>12}{'callbacks/s':>13}"
+    )
+    for name, by_concurrency in results.items():
+        for concurrency, r in by_concurrency.items():
+            print(
+                f"{name:<11}{concurrency:>10}"
+                f"{r['first_p50'] * 1e6:>9.0f}us{r['first_p99'] * 1e6:>9.0f}us"
+                f"{r['repeat_p50'] * 1e6:>10.0f}us{r['repeat_p99'] * 1e6:>10.0f}us"
+                f"{r['callbacks_per_s']:>13.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--callbacks", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument(
+        "--backends", nargs="+", default=["memory", "shared", "redis", "fakeredis"],
+        choices=["memory", "shared", "redis", "fakeredis"]
+    )
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--redis-connections", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
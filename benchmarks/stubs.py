@@ -0,0 +1,191 @@
+"""
+Local stub upstreams for benchmarks
+ASGI apps imitating Zibal verify and the ticketing API, served with hypercorn,
+and the helpers the benchmarks share
+"""
+
+import asyncio
+import json
+import random
+from typing import Optional
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def read_body(receive) -> bytes:
+    """Read a complete ASGI request body"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_json(send, payload, status: int = 200) -> None:
+    """Send a JSON ASGI response"""
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class ZibalStub:
+    """
+    Zibal ``/v1/verify`` stub
+
+    Each verify takes ``latency_ms`` plus up to ``jitter_ms`` of uniform
+    jitter. A share ``error_rate`` of requests gets a 503, and a share
+    ``failure_rate`` of the rest is answered with result 102 (not verified).
+    ``shape`` is ``"full"`` for a response with every field Zibal returns, or
+    ``"minimal"`` for just result and message.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 20.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        failure_rate: float = 0.0,
+        shape: str = "full"
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.failure_rate = failure_rate
+        self.shape = shape
+        self.requests = 0
+
+    def verify_result(self, track_id, verified: bool) -> dict:
+        """Verify response body for one trackId"""
+        if self.shape == "minimal" and verified:
+            return {"result": 100, "message": "success"}
+        if self.shape == "minimal" or not verified:
+            return {"result": 102, "message": "merchant", "status": -1}
+        return {
+            "paidAt": "2024-01-01T12:00:00.000000",
+            "cardNumber": "62741****44",
+            "status": 1,
+            "amount": 1500000,
+            "refNumber": 41256941,
+            "description": f"Reservation {track_id}",
+            "orderId": f"ORD-{track_id}",
+            "result": 100,
+            "message": "success",
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = await read_body(receive)
+        self.requests += 1
+        await asyncio.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+        if random.random() < self.error_rate:
+            await send_json(send, {"message": "unavailable"}, status=503)
+            return
+        track_id = json.loads(body or b"{}").get("trackId")
+        verified = random.random() >= self.failure_rate
+        await send_json(send, self.verify_result(track_id, verified))
+
+
+class TicketingStub:
+    """
+    Ticketing API stub with single and bulk webhook endpoints
+
+    Each request pays ``request_ms`` of fixed overhead (TLS, auth, opening a
+    DB transaction) plus ``item_ms`` per item, while holding one of
+    ``db_connections`` slots, so batching is rewarded the way it would be
+    on the real service. A share ``error_rate`` of requests gets a 503.
+    """
+
+    def __init__(
+        self,
+        request_ms: float = 5.0,
+        item_ms: float = 0.2,
+        db_connections: int = 20,
+        batch_path: str = "/api/v1/payments/zibal-webhook/batch",
+        error_rate: float = 0.0
+    ):
+        self.request_ms = request_ms
+        self.item_ms = item_ms
+        self.error_rate = error_rate
+        self.batch_path = batch_path
+        self._db: Optional[asyncio.Semaphore] = None
+        self._db_connections = db_connections
+        self.requests = 0
+        self.items = 0
+        self.sockets = set()
+
+    def ack(self, item: dict) -> dict:
+        """Acknowledgement for one webhook item"""
+        return {
+            "trackId": item.get("trackId"),
+            "success": item.get("verifyResult", {}).get("result") == 100,
+            "ref_number": f"REF-{item.get('trackId')}",
+            "reservation_id": item.get("trackId"),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if self._db is None:
+            self._db = asyncio.Semaphore(self._db_connections)
+        self.sockets.add(tuple(scope["client"]))
+        body = await read_body(receive)
+        payload = json.loads(body or b"{}")
+        items = payload["items"] if scope["path"] == self.batch_path else [payload]
+
+        self.requests += 1
+        self.items += len(items)
+        async with self._db:
+            await asyncio.sleep((self.request_ms + self.item_ms * len(items)) / 1000)
+
+        if random.random() < self.error_rate:
+            await send_json(send, {"message": "unavailable"}, status=503)
+            return
+        if scope["path"] == self.batch_path:
+            await send_json(send, {"results": [self.ack(item) for item in items]})
+        else:
+            await send_json(send, self.ack(items[0]))
+
+
+class StubServer:
+    """Run an ASGI stub on a local port for the duration of an ``async with``"""
+
+    def __init__(self, app, port: int, host: str = "127.0.0.1"):
+        self.app = app
+        self.host = host
+        self.port = port
+        self._shutdown = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def __aenter__(self) -> "StubServer":
+        # Imported here: benchmarks that only use percentile() need no hypercorn
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        config = Config()
+        config.bind = [f"{self.host}:{self.port}"]
+        config.loglevel = "WARNING"
+        config.backlog = 2048
+        self._task = asyncio.create_task(
+            serve(self.app, config, shutdown_trigger=self._shutdown.wait)
+        )
+        await asyncio.sleep(0.3)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._shutdown.set()
+        await self._task
@@ -0,0 +1,170 @@
+"""
+Circuit breakers for upstream calls
+Fail fast while an upstream is erroring or too slow instead of waiting on it
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from logging_setup import log_event
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker for one upstream
+
+    Outcomes of the last ``window_size`` calls are kept; a call that raises
+    one of ``failure_types`` or takes longer than ``slow_call_seconds``
+    counts as a failure. Other exceptions (bad input, cancellation) are not
+    the upstream's fault and are not recorded at all. Once at least
+    ``min_calls`` outcomes are recorded and the failure rate reaches
+    ``failure_rate``, the circuit opens and calls fail immediately with
+    ``CircuitOpenError`` for ``open_seconds``. It then lets up to
+    ``half_open_calls`` trial calls through: if they all succeed the circuit
+    closes, and any failure opens it again.
+
+    ``on_state_change(name, old_state, new_state)`` is called on every
+    transition, e.g. to update metrics.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = 50,
+        min_calls: int = 20,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 3,
+        failure_types: tuple[type[BaseException], ...] = (Exception,),
+        on_state_change: Optional[Callable[[str, str, str], None]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.failure_types = failure_types
+        self.on_state_change = on_state_change
+        self._clock = clock
+        self._outcomes: deque = deque(maxlen=window_size)
+        self._failures = 0
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._trials_started = 0
+        self._trials_succeeded = 0
+        self.rejected = 0
+        self.transitions: dict[str, int] = {}
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being rejected without reaching the upstream"""
+        if self.state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self.state == OPEN
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await ``fn()`` through the breaker, or raise CircuitOpenError"""
+        self._before_call()
+        started = self._clock()
+        try:
+            result = await fn()
+        except BaseException as e:
+            if isinstance(e, self.failure_types):
+                self._record(False)
+            elif self.state == HALF_OPEN:
+                # Frees the trial slot for a call that can tell
+                self._trials_started -= 1
+            raise
+        self._record(self._clock() - started <= self.slow_call_seconds)
+        return result
+
+    def _before_call(self) -> None:
+        if self.is_open:
+            self.rejected += 1
+            retry_after = self.open_seconds - (self._clock() - self._opened_at)
+            raise CircuitOpenError(self.name, max(retry_after, 0.0))
+        if self.state == HALF_OPEN:
+            if self._trials_started >= self.half_open_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 0.0)
+            self._trials_started += 1
+
+    def _record(self, ok: bool) -> None:
+        if self.state == HALF_OPEN:
+            if not ok:
+                self._transition(OPEN)
+                return
+            self._trials_succeeded += 1
+            if self._trials_succeeded >= self.half_open_calls:
+                self._transition(CLOSED)
+            return
+        if self.state == OPEN:
+            # A call that started before the circuit opened
+            return
+
+        if len(self._outcomes) == self._outcomes.maxlen and not self._outcomes[0]:
+            self._failures -= 1
+        self._outcomes.append(ok)
+        if not ok:
+            self._failures += 1
+        if (
+            len(self._outcomes) >= self.min_calls
+            and self._failures / len(self._outcomes) >= self.failure_rate
+        ):
+            self._transition(OPEN)
+
+    def _transition(self, new_state: str) -> None:
+        old_state = self.state
+        self.state = new_state
+        if new_state == OPEN:
+            self._opened_at = self._clock()
+        elif new_state == HALF_OPEN:
+            self._trials_started = 0
+            self._trials_succeeded = 0
+        elif new_state == CLOSED:
+            self._outcomes.clear()
+            self._failures = 0
+        key = f"{old_state}->{new_state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        log_event(
+            logger, logging.WARNING if new_state == OPEN else logging.INFO,
+            "circuit.transition",
+            upstream=self.name,
+            from_state=old_state,
+            to_state=new_state
+        )
+        if self.on_state_change is not None:
+            self.on_state_change(self.name, old_state, new_state)
+
+    def stats(self) -> dict:
+        """Current state, failure rate and transition counters"""
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "failure_rate": round(self._failures / calls, 4) if calls else 0.0,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+        }
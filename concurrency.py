@@ -0,0 +1,134 @@
+"""
+Outbound concurrency limits
+Per-upstream bounded semaphores with a bounded FIFO wait queue, so bursts
+queue briefly for a slot or are shed at once instead of piling up on the
+upstream or timing out
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+class UpstreamBusyError(Exception):
+    """Raised instead of calling an upstream whose slots and wait queue are taken"""
+
+    def __init__(self, name: str, reason: str):
+        super().__init__(f"Upstream '{name}' is busy ({reason})")
+        self.name = name
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """
+    At most ``max_concurrent`` calls to one upstream at a time (0 = no limit)
+
+    Callers beyond that wait in FIFO order, at most ``max_queue`` of them and
+    for at most ``queue_timeout`` seconds each. A caller that finds the
+    queue full, or waits too long, gets UpstreamBusyError immediately. A
+    released slot is handed straight to the next waiter.
+
+    ``on_wait(seconds)`` is called with the queue wait of every acquired
+    slot (0 when one was free), e.g. to feed a histogram.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int = 100,
+        queue_timeout: float = 2.0,
+        on_wait: Optional[Callable[[float], None]] = None,
+        clock: Callable[[], float] = time.perf_counter
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.on_wait = on_wait
+        self._clock = clock
+        self._waiters: deque = deque()
+        self.active = 0
+        self.acquired = 0
+        self.shed = {QUEUE_FULL: 0, QUEUE_TIMEOUT: 0}
+
+    @property
+    def queued(self) -> int:
+        """Callers waiting for a slot"""
+        return len(self._waiters)
+
+    async def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        Take a slot, waiting at most ``min(queue_timeout, timeout)`` seconds
+
+        Returns:
+            float: Seconds spent waiting in the queue
+        """
+        if not self.max_concurrent or (self.active < self.max_concurrent and not self._waiters):
+            self.active += 1
+            return self._acquired(0.0)
+        if len(self._waiters) >= self.max_queue:
+            self.shed[QUEUE_FULL] += 1
+            raise UpstreamBusyError(self.name, QUEUE_FULL)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = self._clock()
+        wait = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+        try:
+            await asyncio.wait_for(waiter, wait)
+        except asyncio.TimeoutError:
+            self.shed[QUEUE_TIMEOUT] += 1
+            raise UpstreamBusyError(self.name, QUEUE_TIMEOUT) from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the caller gave up
+                self.release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+        # The releasing caller transferred its slot, so active is unchanged
+        return self._acquired(self._clock() - started)
+
+    def _acquired(self, waited: float) -> float:
+        self.acquired += 1
+        if self.on_wait is not None:
+            self.on_wait(waited)
+        return waited
+
+    def release(self) -> None:
+        """Give the slot to the next waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None) -> AsyncIterator[float]:
+        """``async with limiter.slot(timeout) as waited:`` around one upstream call"""
+        waited = await self.acquire(timeout)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "acquired": self.acquired,
+            "shed": dict(self.shed),
+        }
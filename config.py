@@ -3,7 +3,7 @@ Configuration settings for Payment Proxy
 """
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -20,8 +20,161 @@ class Settings(BaseSettings):
     
     # Security
     WEBHOOK_SECRET: str
+    # Id sent in X-Webhook-Key-Id for WEBHOOK_SECRET
+    WEBHOOK_KEY_ID: str = "default"
+    # Extra "id:secret,id:secret" keys that also sign while rotating
+    WEBHOOK_EXTRA_KEYS: str = ""
+    # v1: sign "trackId:success:status"; v2: sign "{timestamp}." + the exact body
+    WEBHOOK_SIGNATURE_VERSION: Literal["v1", "v2"] = "v1"
+    
+    # Upstream HTTP connection pool
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    
+    # Upstream timeouts and retries: each attempt gets at most UPSTREAM_TIMEOUT
+    # seconds, and one callback never spends more than CALLBACK_DEADLINE
+    # seconds on Zibal verify and the webhook together
+    UPSTREAM_TIMEOUT: float = 15.0
+    CALLBACK_DEADLINE: float = 20.0
+    RETRY_MAX_ATTEMPTS: int = 3
+    RETRY_BACKOFF_BASE: float = 0.2
+    RETRY_BACKOFF_MAX: float = 2.0
+    
+    # User-facing latency SLO: a callback still verifying after this many
+    # seconds redirects to the frontend's pending page and finishes in the
+    # background (0 = always wait for the outcome)
+    CALLBACK_PENDING_AFTER: float = 0.0
+    
+    # Concurrent requests per upstream (0 = no limit), and how many callers may
+    # wait for a slot and for how long before being shed
+    ZIBAL_MAX_CONCURRENT: int = 50
+    ZIBAL_MAX_QUEUE: int = 200
+    TICKETING_MAX_CONCURRENT: int = 50
+    TICKETING_MAX_QUEUE: int = 200
+    UPSTREAM_QUEUE_TIMEOUT: float = 2.0
+    
+    # HTTP/2 multiplexing per upstream (opt-in)
+    ZIBAL_HTTP2: bool = False
+    TICKETING_HTTP2: bool = False
+    
+    # Idempotency cache for repeated callbacks (keyed by trackId)
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_CACHE_TTL: float = 3600.0
+    
+    # Payment results served by GET /api/payments/{trackId}/status
+    RESULT_STORE_SIZE: int = 10000
+    RESULT_STORE_TTL: float = 3600.0
+    
+    # Webhook delivery: "sync" waits for the ticketing API before redirecting,
+    # "async" redirects right after verify and delivers from a background queue,
+    # "outbox" does the same from a durable SQLite outbox
+    WEBHOOK_DELIVERY_MODE: Literal["sync", "async", "outbox"] = "sync"
+    WEBHOOK_QUEUE_SIZE: int = 1000
+    WEBHOOK_QUEUE_WORKERS: int = 4
+    WEBHOOK_QUEUE_PUT_TIMEOUT: float = 0.05
+    WEBHOOK_QUEUE_DRAIN_TIMEOUT: float = 10.0
+    WEBHOOK_MAX_ATTEMPTS: int = 5
+    WEBHOOK_RETRY_DELAY: float = 1.0
+    
+    # Batched delivery to the ticketing API bulk endpoint (opt-in)
+    WEBHOOK_BATCH_ENABLED: bool = False
+    WEBHOOK_BATCH_MAX_SIZE: int = 50
+    WEBHOOK_BATCH_WINDOW: float = 0.02
+    WEBHOOK_BATCH_PATH: str = "/api/v1/payments/zibal-webhook/batch"
+    
+    # Circuit breakers around Zibal verify and the ticketing API
+    BREAKER_WINDOW_SIZE: int = 50
+    BREAKER_MIN_CALLS: int = 20
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_SLOW_CALL_SECONDS: float = 5.0
+    BREAKER_OPEN_SECONDS: float = 30.0
+    BREAKER_HALF_OPEN_CALLS: int = 3
+    
+    # Durable webhook outbox (WEBHOOK_DELIVERY_MODE=outbox)
+    OUTBOX_PATH: str = "outbox.db"
+    OUTBOX_BATCH_SIZE: int = 256
+    OUTBOX_BATCH_WINDOW: float = 0.002
+    OUTBOX_DISPATCH_CONCURRENCY: int = 8
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 20
+    OUTBOX_MAX_RETRY_DELAY: float = 300.0
+    OUTBOX_RETENTION: float = 604800.0
+    # Seconds a worker's claim on a dispatch batch lasts; rows claimed by a
+    # worker that died are delivered by another once it expires
+    OUTBOX_LEASE_SECONDS: float = 600.0
+    # Callbacks stopped by Zibal's open circuit are stored here (same outbox
+    # format, OUTBOX_* settings) and run again once it closes, while the user
+    # gets the pending page; empty sends them to the failure page instead
+    CALLBACK_OUTBOX_PATH: str = "callbacks.db"
+    
+    # Readiness (/health/ready): background upstream probes
+    READINESS_PROBE_INTERVAL: float = 5.0
+    READINESS_PROBE_TIMEOUT: float = 2.0
+    # Upstreams that must be healthy for the instance to report ready
+    READINESS_REQUIRED_UPSTREAMS: str = "zibal,ticketing"
+    # URLs to probe; default to the Zibal host and TICKETING_API_URL
+    ZIBAL_PROBE_URL: Optional[str] = None
+    TICKETING_PROBE_URL: Optional[str] = None
+    
+    # Directory with prebuilt API docs (python docs.py <dir>); rendered at startup if unset
+    DOCS_BUILD_DIR: Optional[str] = None
+    
+    # Serve /health and /redirect/{trackId} without FastAPI routing
+    FAST_PATH_ENABLED: bool = True
+    
+    # Admission control for /api/zibal/callback (enforced per worker)
+    # Callbacks handled at once before new ones are shed (0 = no cap)
+    ADMISSION_MAX_IN_FLIGHT: int = 1000
+    # Token bucket per client address: callbacks per second and burst (rate 0 =
+    # off). Only enable it when the client address is the payer's: behind a
+    # load balancer, list it in FORWARDED_ALLOW_IPS, or every payer shares one bucket
+    ADMISSION_CLIENT_RATE: float = 0.0
+    ADMISSION_CLIENT_BURST: int = 20
+    ADMISSION_CLIENT_TABLE_SIZE: int = 100000
+    # Shed callbacks get "503" with Retry-After, or "redirect" (to
+    # ADMISSION_RETRY_URL plus the callback query, default
+    # {TICKETING_FRONTEND_URL}/payment/retry) once the frontend has that page
+    ADMISSION_OVERFLOW_RESPONSE: Literal["redirect", "503"] = "503"
+    ADMISSION_RETRY_URL: Optional[str] = None
+    ADMISSION_RETRY_AFTER: int = 1
+    
+    # Production runner (python runner.py): uvicorn workers sharing one socket
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    # Worker processes; 0 starts one per available CPU
+    WORKERS: int = 1
+    BACKLOG: int = 2048
+    # Connections per worker beyond which new requests get 503 (unlimited if unset)
+    LIMIT_CONCURRENCY: Optional[int] = None
+    KEEPALIVE_TIMEOUT: int = 5
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = 30
+    # Proxies (comma-separated IPs or CIDRs, "*" for any) trusted to set
+    # X-Forwarded-For / X-Forwarded-Proto; the client address of their
+    # requests is taken from those headers
+    FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+    
+    # Store shared by the workers (a Unix socket); runner.py starts it and
+    # sets the path when WORKERS > 1
+    SHARED_STATE_PATH: Optional[str] = None
+    # How often each worker publishes its metrics for the others to merge
+    METRICS_SYNC_INTERVAL: float = 1.0
+    
+    # Per-trackId callback state (decisions and leases): "memory" shares it
+    # between the workers of one instance, "redis" across replicas
+    STATE_STORE: Literal["memory", "redis"] = "memory"
+    STATE_STORE_TIMEOUT: float = 1.0
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_KEY_PREFIX: str = "payment-proxy:"
     
     # Optional
+    LOG_LEVEL: str = "INFO"
+    # Full verify/ticketing payloads: every failure, 1 in N successes
+    LOG_PAYLOAD_SAMPLE_RATE: int = 100
+    # Comma-separated trackIds whose payloads are always logged
+    LOG_PAYLOAD_TRACK_IDS: str = ""
+    # Log every payload
     DEBUG: bool = False
     
     class Config:
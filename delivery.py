@@ -0,0 +1,138 @@
+"""
+Asynchronous webhook delivery
+In-process queue with worker tasks that deliver webhooks in the background
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from breaker import CircuitOpenError
+from logging_setup import log_event
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[dict], Awaitable[dict]]
+
+
+class WebhookDeliveryQueue:
+    """
+    Bounded queue of webhook payloads drained by a pool of worker tasks
+
+    ``enqueue`` waits up to ``put_timeout`` for a free slot and returns False
+    when the queue stays full, so callers can fall back to delivering inline
+    instead of growing memory without limit. Failed deliveries are retried
+    with exponential backoff up to ``max_attempts`` times; waiting for an open
+    circuit to close does not use up an attempt.
+    """
+
+    def __init__(
+        self,
+        deliver: Deliver,
+        workers: int = 4,
+        maxsize: int = 1000,
+        max_attempts: int = 5,
+        retry_delay: float = 1.0,
+        put_timeout: float = 0.05
+    ):
+        self._deliver = deliver
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._workers: list[asyncio.Task] = []
+        self.worker_count = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.put_timeout = put_timeout
+        self.enqueued = 0
+        self.delivered = 0
+        self.retries = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        """Spawn the worker tasks"""
+        for index in range(self.worker_count):
+            self._workers.append(
+                asyncio.create_task(self._worker(), name=f"webhook-worker-{index}")
+            )
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Wait up to ``drain_timeout`` seconds for queued items, then stop workers"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            undelivered = self.enqueued - self.delivered - self.failed
+            log_event(
+                logger, logging.WARNING, "webhook_queue.stopped",
+                undelivered=undelivered
+            )
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def enqueue(self, webhook_data: dict) -> bool:
+        """Queue a webhook for delivery; False if the queue is full (backpressure)"""
+        try:
+            await asyncio.wait_for(
+                self._queue.put(webhook_data), timeout=self.put_timeout
+            )
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            webhook_data = await self._queue.get()
+            try:
+                await self._deliver_with_retry(webhook_data)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver_with_retry(self, webhook_data: dict) -> Optional[dict]:
+        trackId = webhook_data.get("trackId")
+        attempt = 0
+        while attempt < self.max_attempts:
+            attempt += 1
+            try:
+                result = await self._deliver(webhook_data)
+            except asyncio.CancelledError:
+                raise
+            except CircuitOpenError as e:
+                attempt -= 1
+                await asyncio.sleep(max(e.retry_after, self.retry_delay))
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self.failed += 1
+                    log_event(
+                        logger, logging.ERROR, "webhook.failed",
+                        trackId=trackId, attempts=attempt, error=str(e)
+                    )
+                    return None
+                self.retries += 1
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                log_event(
+                    logger, logging.WARNING, "webhook.retry",
+                    trackId=trackId, attempt=attempt, error=str(e), delay_s=delay
+                )
+                await asyncio.sleep(delay)
+            else:
+                self.delivered += 1
+                log_event(
+                    logger, logging.INFO, "webhook.delivered",
+                    trackId=trackId, attempts=attempt, success=result.get("success")
+                )
+                return result
+        return None
+
+    def stats(self) -> dict:
+        """Queue depth and delivery counters"""
+        return {
+            "depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "retries": self.retries,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,101 @@
+"""
+Prebuilt API documentation
+The OpenAPI schema and the Scalar page are rendered once, at image build time
+or at startup, and served as cached bytes with ETags
+
+Build them ahead of time with:
+    python docs.py <directory>
+"""
+
+import hashlib
+import json
+import os
+import sys
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+OPENAPI_FILE = "openapi.json"
+HTML_FILE = "docs.html"
+
+
+class CachedDocument:
+    """Rendered document bytes with a strong ETag"""
+
+    def __init__(self, body: bytes, media_type: str):
+        self.body = body
+        self.media_type = media_type
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+    def response(self, request: Request) -> Response:
+        """The document, or 304 Not Modified when the client already has it"""
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == self.etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type=self.media_type, headers=headers)
+
+
+class DocsCache:
+    """
+    OpenAPI JSON and Scalar HTML for an app, rendered at most once
+
+    ``load`` picks up documents written by ``build`` (e.g. during the
+    Docker build); otherwise ``render`` generates them from the app. Either
+    way no request pays for schema generation or imports ``scalar_fastapi``
+    after startup.
+    """
+
+    def __init__(self, app: FastAPI, openapi_url: str = "/openapi.json"):
+        self.app = app
+        self.openapi_url = openapi_url
+        self.openapi: Optional[CachedDocument] = None
+        self.html: Optional[CachedDocument] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether both documents are available"""
+        return self.openapi is not None and self.html is not None
+
+    def render(self) -> None:
+        """Generate both documents from the app"""
+        # Imported here: only needed to render the page, not to serve callbacks
+        from scalar_fastapi import get_scalar_api_reference
+
+        openapi = json.dumps(self.app.openapi(), separators=(",", ":")).encode()
+        html = get_scalar_api_reference(
+            openapi_url=self.openapi_url,
+            title=self.app.title,
+        ).body
+        self.openapi = CachedDocument(openapi, "application/json")
+        self.html = CachedDocument(html, "text/html; charset=utf-8")
+
+    def load(self, directory: str) -> bool:
+        """Use documents prebuilt into ``directory``; False if they are missing"""
+        try:
+            with open(os.path.join(directory, OPENAPI_FILE), "rb") as f:
+                openapi = f.read()
+            with open(os.path.join(directory, HTML_FILE), "rb") as f:
+                html = f.read()
+        except OSError:
+            return False
+        self.openapi = CachedDocument(openapi, "application/json")
+        self.html = CachedDocument(html, "text/html; charset=utf-8")
+        return True
+
+    def build(self, directory: str) -> None:
+        """Render both documents and write them to ``directory``"""
+        self.render()
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, OPENAPI_FILE), "wb") as f:
+            f.write(self.openapi.body)
+        with open(os.path.join(directory, HTML_FILE), "wb") as f:
+            f.write(self.html.body)
+
+
+if __name__ == "__main__":
+    from main import app
+
+    output = sys.argv[1] if len(sys.argv) > 1 else "docs_build"
+    DocsCache(app).build(output)
+    print(f"API docs written to {output}")
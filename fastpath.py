@@ -0,0 +1,81 @@
+"""
+ASGI fast path
+Serves /health and /redirect/{trackId}, the highest-volume routes, before
+requests reach FastAPI routing, dependency resolution and response models
+"""
+
+from typing import Callable, Optional
+from urllib.parse import quote
+
+HEALTH_BODY = b'{"status":"healthy"}'
+
+# Characters RedirectResponse leaves unquoted in the Location header
+LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+
+REDIRECT_PREFIX = "/redirect/"
+
+
+class FastPathMiddleware:
+    """
+    Answer health checks and gateway redirects with prebuilt raw responses
+
+    Responses match what the FastAPI routes return (same status, headers and
+    body). Anything the fast path does not fully handle goes to the wrapped
+    app unchanged: other paths, methods other than GET, a ``trackId`` that
+    is empty or spans several path segments, and CORS requests (with an
+    ``Origin`` header). FastAPI's 404/405 and CORS handling therefore still
+    apply.
+
+    ``on_redirect(trackId, url)`` is called for every redirect served here,
+    e.g. to update metrics and log it like the FastAPI route does.
+    """
+
+    def __init__(
+        self,
+        app,
+        gateway_url: str,
+        on_redirect: Optional[Callable[[str, str], None]] = None
+    ):
+        self.app = app
+        self.gateway_url = gateway_url
+        self.on_redirect = on_redirect
+        self._health_start = {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-length", str(len(HEALTH_BODY)).encode()),
+                (b"content-type", b"application/json"),
+            ],
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            path = scope["path"]
+            if path == "/health" and not self._is_cors(scope):
+                await send(self._health_start)
+                await send({"type": "http.response.body", "body": HEALTH_BODY})
+                return
+            if path.startswith(REDIRECT_PREFIX):
+                trackId = path[len(REDIRECT_PREFIX):]
+                if trackId and "/" not in trackId and not self._is_cors(scope):
+                    await self._redirect(trackId, send)
+                    return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _is_cors(scope) -> bool:
+        return any(name == b"origin" for name, _ in scope["headers"])
+
+    async def _redirect(self, trackId: str, send) -> None:
+        url = f"{self.gateway_url}{trackId}"
+        if self.on_redirect is not None:
+            self.on_redirect(trackId, url)
+        await send({
+            "type": "http.response.start",
+            "status": 303,
+            "headers": [
+                (b"content-length", b"0"),
+                (b"location", quote(url, safe=LOCATION_SAFE).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,58 @@
+"""
+Shared upstream HTTP clients
+Long-lived, pooled httpx clients for Zibal and the ticketing API
+"""
+
+import httpx
+from config import settings
+
+
+def create_http_client(http2: bool = False) -> httpx.AsyncClient:
+    """
+    Create a pooled HTTP client using the configured connection limits
+    
+    With ``http2`` enabled, HTTP/2 is negotiated via ALPN on https upstreams,
+    so a burst of concurrent requests is multiplexed over a few sockets.
+    Requires the ``h2`` package (``httpx[http2]``).
+    """
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(limits=limits, http2=http2)
+
+
+class UpstreamClients:
+    """One HTTP client per upstream, opened at startup and closed at shutdown"""
+
+    def __init__(self):
+        self.zibal: httpx.AsyncClient = create_http_client(
+            http2=settings.ZIBAL_HTTP2
+        )
+        self.ticketing: httpx.AsyncClient = create_http_client(
+            http2=settings.TICKETING_HTTP2
+        )
+
+    async def aclose(self) -> None:
+        """Close all upstream clients and release their pooled connections"""
+        await self.zibal.aclose()
+        await self.ticketing.aclose()
+
+
+def pool_stats(client: httpx.AsyncClient) -> dict:
+    """
+    Connection pool usage of a client
+    
+    Read from the httpcore pool behind the client; counts are zero if the
+    transport does not expose one.
+    """
+    pool = getattr(client._transport, "_pool", None)
+    requests = list(getattr(pool, "_requests", ()))
+    queued = sum(1 for request in requests if request.is_queued())
+    return {
+        "connections": len(getattr(pool, "connections", ())),
+        "max_connections": settings.HTTP_MAX_CONNECTIONS,
+        "active_requests": len(requests) - queued,
+        "queued_requests": queued,
+    }
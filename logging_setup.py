@@ -0,0 +1,120 @@
+"""
+Structured, non-blocking logging
+Log records are handed to a background thread through a queue and written
+there as one JSON object per line, so the event loop never formats or
+writes log output itself
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Iterable, Optional
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON line: timestamp, level, logger, event and fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = "".join(traceback.format_exception(*record.exc_info))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues records untouched
+
+    The stock ``prepare`` formats the message on the calling thread so the
+    record can be pickled; records here never leave the process, so all
+    string work is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def log_event(
+    logger: logging.Logger,
+    level: int,
+    event: str,
+    exc_info: bool = False,
+    **fields
+) -> None:
+    """
+    Log a structured event with key/value fields
+
+    Nothing is built when the level is disabled, and the fields are only
+    serialized by the listener thread.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+
+class PayloadSampler:
+    """
+    Decide which callbacks get their full upstream payloads logged
+
+    Failures are always logged. Successes are logged one in ``sample_rate``
+    (0 disables them), except for trackIds in ``track_ids`` or when
+    ``verbose`` is set, which log every payload.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 100,
+        track_ids: Iterable[str] = (),
+        verbose: bool = False
+    ):
+        self.sample_rate = sample_rate
+        self.track_ids = frozenset(t.strip() for t in track_ids if t.strip())
+        self.verbose = verbose
+        self._successes = 0
+
+    def should_log(self, trackId: str, ok: bool) -> bool:
+        """Whether to log the payloads of this callback"""
+        if not ok or self.verbose or trackId in self.track_ids:
+            return True
+        if self.sample_rate <= 0:
+            return False
+        self._successes += 1
+        return self._successes % self.sample_rate == 0
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: str = "INFO") -> QueueListener:
+    """Route all logging through a queue to a JSON stdout handler on a background thread"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(_listener.stop)
+    return _listener
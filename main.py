@@ -3,26 +3,485 @@ Zibal Payment Callback Proxy
 A microservice that receives Zibal payment callbacks and forwards them to the ticketing API
 """
 
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Path, Query, Request, HTTPException
 from fastapi import status as http_status
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from scalar_fastapi import get_scalar_api_reference
+from contextlib import asynccontextmanager
+import asyncio
+import os
+import time
 import httpx
 import logging
-from typing import Optional
+from typing import Annotated, Awaitable, Optional
 from datetime import datetime
-import hashlib
-import hmac
+from urllib.parse import urlencode
 from config import settings
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from http_clients import UpstreamClients, pool_stats
+from cache import TTLCache
+from admission import AdmissionController, TokenBucketLimiter
+from singleflight import SingleFlight
+from webhooks import build_webhook_data, send_webhook, send_webhook_batch
+from batcher import WebhookBatcher
+from delivery import WebhookDeliveryQueue
+from outbox import WebhookOutbox
+from breaker import CircuitBreaker, CircuitOpenError
+from concurrency import ConcurrencyLimiter, UpstreamBusyError
+from retry import Deadline, DeadlineExceeded, RetryPolicy
+from readiness import ReadinessProber, Upstream
+from logging_setup import PayloadSampler, log_event, setup_logging
+from fastpath import FastPathMiddleware
+from shared_state import SharedMetrics, SharedStateClient, SharedStateError
+from state_store import CallbackStates, RedisStateStore
+from docs import DocsCache
+from results import ERROR, FAILED, PAID, PROCESSING, PaymentResults
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    BREAKER_TRANSITIONS,
+    CALLBACK_DURATION,
+    CALLBACK_IN_FLIGHT,
+    CALLBACK_REQUESTS,
+    REDIRECT_FAILED,
+    REDIRECT_PENDING,
+    REDIRECT_REQUESTS,
+    REDIRECT_SUCCESS,
+    UPSTREAM_QUEUE_WAIT,
+    VERIFY_DURATION,
+    VERIFY_IN_FLIGHT,
+    VERIFY_RESULT_OK,
+    VERIFY_RESULTS,
+    WEBHOOK_DURATION,
+    WEBHOOK_IN_FLIGHT,
+    registry as metrics_registry,
 )
+
+# Setup logging: JSON lines written by a background thread
+setup_logging(settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+
+# Errors that say an upstream is unreachable, too slow or failing (5xx)
+UPSTREAM_FAILURES = (httpx.TransportError, httpx.HTTPStatusError, asyncio.TimeoutError)
+
+
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a ``time.perf_counter()`` reading"""
+    return round((time.perf_counter() - started) * 1000, 1)
+
+# Final redirect decision per trackId, so repeated callbacks skip the upstreams
+callback_cache = TTLCache(
+    maxsize=settings.IDEMPOTENCY_CACHE_SIZE,
+    ttl=settings.IDEMPOTENCY_CACHE_TTL
+)
+
+# trackIds Zibal has verified, so a replay of a run that did not reach a
+# final decision still counts Zibal's 201 ("already verified") as verified
+verified_payments = TTLCache(
+    maxsize=settings.IDEMPOTENCY_CACHE_SIZE,
+    ttl=settings.IDEMPOTENCY_CACHE_TTL
+)
+
+# Latest outcome per trackId, for frontends polling the status endpoint
+payment_results = PaymentResults(
+    maxsize=settings.RESULT_STORE_SIZE,
+    ttl=settings.RESULT_STORE_TTL
+)
+
+# Concurrent callbacks for the same trackId share one verify/webhook run
+callback_flights = SingleFlight()
+
+# Sheds callbacks beyond the in-flight cap or a client address's rate
+admission = AdmissionController(
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    limiter=TokenBucketLimiter(
+        rate=settings.ADMISSION_CLIENT_RATE,
+        burst=settings.ADMISSION_CLIENT_BURST,
+        maxsize=settings.ADMISSION_CLIENT_TABLE_SIZE
+    ) if settings.ADMISSION_CLIENT_RATE > 0 else None
+)
+
+# Which callbacks get their full upstream payloads logged
+payload_sampler = PayloadSampler(
+    sample_rate=settings.LOG_PAYLOAD_SAMPLE_RATE,
+    track_ids=settings.LOG_PAYLOAD_TRACK_IDS.split(","),
+    verbose=settings.DEBUG
+)
+
+
+def register_collectors(state) -> None:
+    """Expose counters kept by the cache, breakers and delivery as metrics"""
+    metrics_registry.collector(
+        "payment_proxy_idempotency_cache_lookups_total",
+        "Idempotency cache lookups by outcome",
+        "counter", ("outcome",),
+        lambda: [(("hit",), callback_cache.hits), (("miss",), callback_cache.misses)]
+    )
+    metrics_registry.collector(
+        "payment_proxy_idempotency_cache_entries",
+        "Redirect decisions currently cached",
+        "gauge", (),
+        lambda: [((), len(callback_cache))]
+    )
+    metrics_registry.collector(
+        "payment_proxy_payment_results_entries",
+        "Payment results held for the status endpoint",
+        "gauge", (),
+        lambda: [((), len(payment_results))]
+    )
+    metrics_registry.collector(
+        "payment_proxy_coalesced_callbacks_total",
+        "Callbacks that joined an in-flight run for the same trackId",
+        "counter", (),
+        lambda: [((), callback_flights.followers)]
+    )
+    metrics_registry.collector(
+        "payment_proxy_state_store_errors_total",
+        "Callback state store calls that failed, falling back to this process alone",
+        "counter", (),
+        lambda: [((), state.callback_states.errors)] if state.callback_states else []
+    )
+    metrics_registry.collector(
+        "payment_proxy_callbacks_shed_total",
+        "Callbacks shed by admission control",
+        "counter", ("reason",),
+        lambda: [((reason,), count) for reason, count in admission.shed.items()]
+    )
+    metrics_registry.collector(
+        "payment_proxy_admission_tracked_clients",
+        "Client addresses with a rate limit bucket",
+        "gauge", (),
+        lambda: [((), len(admission.limiter) if admission.limiter is not None else 0)]
+    )
+    metrics_registry.collector(
+        "payment_proxy_upstream_concurrency",
+        "Upstream calls holding or queued for a concurrency slot",
+        "gauge", ("upstream", "state"),
+        lambda: [
+            ((name, "active"), limiter.active) for name, limiter in state.limiters.items()
+        ] + [
+            ((name, "queued"), limiter.queued) for name, limiter in state.limiters.items()
+        ]
+    )
+    metrics_registry.collector(
+        "payment_proxy_upstream_shed_total",
+        "Upstream calls shed because the wait queue was full or the wait timed out",
+        "counter", ("upstream", "reason"),
+        lambda: [
+            ((name, reason), count)
+            for name, limiter in state.limiters.items()
+            for reason, count in limiter.shed.items()
+        ]
+    )
+    metrics_registry.collector(
+        "payment_proxy_upstream_retries_total",
+        "Upstream call retries",
+        "counter", (),
+        lambda: [((), state.retry_policy.retries)]
+    )
+    metrics_registry.collector(
+        "payment_proxy_circuit_state",
+        "Circuit breaker state (1 for the current state)",
+        "gauge", ("upstream", "state"),
+        lambda: [
+            ((name, circuit), int(breaker.state == circuit))
+            for name, breaker in state.breakers.items()
+            for circuit in ("closed", "open", "half_open")
+        ]
+    )
+    metrics_registry.collector(
+        "payment_proxy_circuit_rejected_total",
+        "Calls rejected by an open circuit",
+        "counter", ("upstream",),
+        lambda: [((name,), breaker.rejected) for name, breaker in state.breakers.items()]
+    )
+    metrics_registry.collector(
+        "payment_proxy_upstream_up",
+        "Whether the upstream was reachable on the last readiness probe",
+        "gauge", ("upstream",),
+        lambda: [
+            ((name,), int(report.get("reachable", False)))
+            for name, report in state.readiness.report["upstreams"].items()
+        ]
+    )
+    metrics_registry.collector(
+        "payment_proxy_ready",
+        "Whether this instance reports ready",
+        "gauge", (),
+        lambda: [((), int(state.readiness.ready))]
+    )
+    metrics_registry.collector(
+        "payment_proxy_upstream_pool_requests",
+        "Upstream requests holding or waiting for a pooled connection",
+        "gauge", ("upstream", "state"),
+        lambda: [
+            ((name, pool_state), pool_stats(client)[f"{pool_state}_requests"])
+            for name, client in (
+                ("zibal", state.upstreams.zibal),
+                ("ticketing", state.upstreams.ticketing)
+            )
+            for pool_state in ("active", "queued")
+        ]
+    )
+    metrics_registry.collector(
+        "payment_proxy_webhook_deliveries_total",
+        "Background webhook deliveries by outcome",
+        "counter", ("outcome",),
+        lambda: [
+            ((outcome,), value)
+            for outcome, value in webhook_delivery_stats(state).items()
+            if outcome in ("delivered", "retries", "failed", "rejected")
+        ]
+    )
+    metrics_registry.collector(
+        "payment_proxy_webhook_queue_depth",
+        "Webhooks waiting in the in-memory delivery queue",
+        "gauge", (),
+        lambda: [((), webhook_delivery_stats(state).get("depth", 0))]
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared upstream HTTP clients on startup and close them on shutdown"""
+    app.state.upstreams = upstreams = UpstreamClients()
+    log_event(logger, logging.INFO, "startup.upstreams_ready")
+    
+    app.state.breakers = breakers = {
+        name: CircuitBreaker(
+            name,
+            window_size=settings.BREAKER_WINDOW_SIZE,
+            min_calls=settings.BREAKER_MIN_CALLS,
+            failure_rate=settings.BREAKER_FAILURE_RATE,
+            slow_call_seconds=settings.BREAKER_SLOW_CALL_SECONDS,
+            open_seconds=settings.BREAKER_OPEN_SECONDS,
+            half_open_calls=settings.BREAKER_HALF_OPEN_CALLS,
+            # Only the upstream's own failures; e.g. a bad trackId is not one
+            failure_types=UPSTREAM_FAILURES,
+            on_state_change=lambda upstream, old, new: BREAKER_TRANSITIONS.labels(
+                upstream, old, new
+            ).inc()
+        )
+        for name in ("zibal", "ticketing")
+    }
+    
+    # Bounded concurrency per upstream, applied outside the breakers so shed
+    # calls and queue waits never count as upstream failures
+    app.state.limiters = limiters = {
+        name: ConcurrencyLimiter(
+            name,
+            max_concurrent=max_concurrent,
+            max_queue=max_queue,
+            queue_timeout=settings.UPSTREAM_QUEUE_TIMEOUT,
+            on_wait=UPSTREAM_QUEUE_WAIT.labels(name).observe
+        )
+        for name, max_concurrent, max_queue in (
+            ("zibal", settings.ZIBAL_MAX_CONCURRENT, settings.ZIBAL_MAX_QUEUE),
+            ("ticketing", settings.TICKETING_MAX_CONCURRENT, settings.TICKETING_MAX_QUEUE),
+        )
+    }
+    
+    # Every webhook (inline, queued or from the outbox) goes through deliver_webhook
+    app.state.webhook_batcher = None
+    if settings.WEBHOOK_BATCH_ENABLED:
+        app.state.webhook_batcher = WebhookBatcher(
+            send_batch=lambda items: send_webhook_batch(upstreams.ticketing, items),
+            max_size=settings.WEBHOOK_BATCH_MAX_SIZE,
+            window=settings.WEBHOOK_BATCH_WINDOW
+        )
+        app.state.webhook_batcher.start()
+        log_event(
+            logger, logging.INFO, "startup.webhook_batching",
+            max_size=settings.WEBHOOK_BATCH_MAX_SIZE
+        )
+    
+    async def send(data: dict, timeout: float) -> dict:
+        if app.state.webhook_batcher is not None:
+            return await app.state.webhook_batcher.submit(data)
+        return await send_webhook(upstreams.ticketing, data, timeout=timeout)
+    
+    async def deliver_webhook(data: dict, timeout: float = settings.UPSTREAM_TIMEOUT) -> dict:
+        async with limiters["ticketing"].slot(timeout) as waited:
+            # wait_for bounds the whole call; httpx timeouts only bound each I/O step
+            timeout = max(timeout - waited, 0.001)
+            return await breakers["ticketing"].call(
+                lambda: asyncio.wait_for(send(data, timeout), timeout)
+            )
+    
+    app.state.deliver_webhook = deliver_webhook
+    
+    app.state.retry_policy = RetryPolicy(
+        max_attempts=settings.RETRY_MAX_ATTEMPTS,
+        base_delay=settings.RETRY_BACKOFF_BASE,
+        max_delay=settings.RETRY_BACKOFF_MAX,
+        attempt_timeout=settings.UPSTREAM_TIMEOUT
+    )
+    
+    # The in-memory queue also backs sync mode while the ticketing circuit is open
+    app.state.webhook_queue = None
+    if settings.WEBHOOK_DELIVERY_MODE in ("sync", "async"):
+        app.state.webhook_queue = WebhookDeliveryQueue(
+            deliver=app.state.deliver_webhook,
+            workers=settings.WEBHOOK_QUEUE_WORKERS,
+            maxsize=settings.WEBHOOK_QUEUE_SIZE,
+            max_attempts=settings.WEBHOOK_MAX_ATTEMPTS,
+            retry_delay=settings.WEBHOOK_RETRY_DELAY,
+            put_timeout=settings.WEBHOOK_QUEUE_PUT_TIMEOUT
+        )
+        app.state.webhook_queue.start()
+        if settings.WEBHOOK_DELIVERY_MODE == "async":
+            log_event(
+                logger, logging.INFO, "startup.webhook_queue",
+                workers=settings.WEBHOOK_QUEUE_WORKERS
+            )
+    
+    app.state.webhook_outbox = None
+    if settings.WEBHOOK_DELIVERY_MODE == "outbox":
+        app.state.webhook_outbox = WebhookOutbox(
+            path=settings.OUTBOX_PATH,
+            deliver=app.state.deliver_webhook,
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            batch_window=settings.OUTBOX_BATCH_WINDOW,
+            concurrency=settings.OUTBOX_DISPATCH_CONCURRENCY,
+            poll_interval=settings.OUTBOX_POLL_INTERVAL,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            retry_delay=settings.WEBHOOK_RETRY_DELAY,
+            max_retry_delay=settings.OUTBOX_MAX_RETRY_DELAY,
+            retention=settings.OUTBOX_RETENTION,
+            lease_seconds=settings.OUTBOX_LEASE_SECONDS
+        )
+        await app.state.webhook_outbox.start()
+        log_event(
+            logger, logging.INFO, "startup.webhook_outbox",
+            path=settings.OUTBOX_PATH
+        )
+    
+    zibal_url = httpx.URL(settings.ZIBAL_VERIFY_URL)
+    app.state.readiness = ReadinessProber(
+        {
+            "zibal": Upstream(
+                upstreams.zibal,
+                settings.ZIBAL_PROBE_URL or f"{zibal_url.scheme}://{zibal_url.netloc.decode()}/",
+                breakers["zibal"]
+            ),
+            "ticketing": Upstream(
+                upstreams.ticketing,
+                settings.TICKETING_PROBE_URL or settings.TICKETING_API_URL,
+                breakers["ticketing"]
+            ),
+        },
+        required=[
+            name.strip()
+            for name in settings.READINESS_REQUIRED_UPSTREAMS.split(",")
+            if name.strip()
+        ],
+        interval=settings.READINESS_PROBE_INTERVAL,
+        timeout=settings.READINESS_PROBE_TIMEOUT
+    )
+    app.state.readiness.start()
+    
+    register_collectors(app.state)
+    
+    # Under runner.py with several workers: share callback state and metrics
+    app.state.shared_metrics = None
+    shared_client = None
+    if settings.SHARED_STATE_PATH:
+        shared_client = SharedStateClient(
+            settings.SHARED_STATE_PATH, timeout=settings.STATE_STORE_TIMEOUT
+        )
+        try:
+            await shared_client.connect()
+        except SharedStateError as e:
+            # Calls reconnect on their own; until then each worker decides alone
+            log_event(logger, logging.WARNING, "startup.shared_state_unavailable", error=str(e))
+        app.state.shared_metrics = SharedMetrics(
+            shared_client, metrics_registry, interval=settings.METRICS_SYNC_INTERVAL
+        )
+        log_event(
+            logger, logging.INFO, "startup.shared_state",
+            path=settings.SHARED_STATE_PATH, worker=os.getpid()
+        )
+    
+    # A single process needs no store: the idempotency cache and coalescing cover it
+    state_store = shared_client
+    if settings.STATE_STORE == "redis":
+        state_store = RedisStateStore(
+            url=settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            key_prefix=settings.REDIS_KEY_PREFIX,
+            timeout=settings.STATE_STORE_TIMEOUT
+        )
+        log_event(logger, logging.INFO, "startup.state_store", backend="redis")
+    # Processes publish payment results to each other through the same store
+    payment_results.store = state_store
+    app.state.callback_states = None
+    if state_store is not None:
+        app.state.callback_states = CallbackStates(
+            state_store,
+            ttl=settings.IDEMPOTENCY_CACHE_TTL,
+            # The lease holder finishes within the deadline; the margin covers store round trips
+            lease_ttl=settings.CALLBACK_DEADLINE + 5.0
+        )
+    
+    async def replay_callback(params: dict) -> dict:
+        # CircuitOpenError while Zibal's circuit is still open: the outbox
+        # waits it out without using an attempt
+        _, final = await callback_flights.do(
+            params["trackId"], lambda: run_callback(app.state, **params)
+        )
+        if not final:
+            raise RuntimeError("callback not settled")
+        return {"success": True}
+    
+    # Started once the state store is set up: stored callbacks run right away
+    app.state.callback_outbox = None
+    if settings.CALLBACK_OUTBOX_PATH:
+        app.state.callback_outbox = WebhookOutbox(
+            path=settings.CALLBACK_OUTBOX_PATH,
+            deliver=replay_callback,
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            batch_window=settings.OUTBOX_BATCH_WINDOW,
+            concurrency=settings.OUTBOX_DISPATCH_CONCURRENCY,
+            poll_interval=settings.OUTBOX_POLL_INTERVAL,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            retry_delay=settings.WEBHOOK_RETRY_DELAY,
+            max_retry_delay=settings.OUTBOX_MAX_RETRY_DELAY,
+            retention=settings.OUTBOX_RETENTION,
+            lease_seconds=settings.OUTBOX_LEASE_SECONDS
+        )
+        await app.state.callback_outbox.start()
+    if app.state.shared_metrics is not None:
+        app.state.shared_metrics.start()
+    
+    if not (settings.DOCS_BUILD_DIR and docs_cache.load(settings.DOCS_BUILD_DIR)):
+        # Not prebuilt: render once the server is up, before anyone asks for it
+        asyncio.get_running_loop().call_soon(docs_cache.render)
+    
+    try:
+        yield
+    finally:
+        await app.state.readiness.stop()
+        if app.state.callback_outbox is not None:
+            await app.state.callback_outbox.stop()
+        # Callbacks finishing in the background after a pending redirect
+        unfinished = await callback_flights.drain(settings.WEBHOOK_QUEUE_DRAIN_TIMEOUT)
+        if unfinished:
+            log_event(logger, logging.WARNING, "shutdown.callbacks_unfinished", count=unfinished)
+        if app.state.shared_metrics is not None:
+            await app.state.shared_metrics.stop()
+        if app.state.webhook_queue is not None:
+            await app.state.webhook_queue.stop(settings.WEBHOOK_QUEUE_DRAIN_TIMEOUT)
+        if app.state.webhook_outbox is not None:
+            await app.state.webhook_outbox.stop()
+        if app.state.webhook_batcher is not None:
+            await app.state.webhook_batcher.stop()
+        await upstreams.aclose()
+        if state_store is not None and state_store is not shared_client:
+            await state_store.close()
+        if shared_client is not None:
+            await shared_client.close()
+        log_event(logger, logging.INFO, "shutdown.upstreams_closed")
+
+
 app = FastAPI(
     title="Zibal Payment Gateway Proxy",
     description="""
@@ -53,9 +512,14 @@ app = FastAPI(
     """,
     version="1.0.0",
     docs_url=None,  # Disable default Swagger
-    redoc_url=None  # Disable ReDoc
+    redoc_url=None,  # Disable ReDoc
+    openapi_url=None,  # Served prebuilt by openapi_json below
+    lifespan=lifespan
 )
 
+# OpenAPI schema and Scalar page, rendered once instead of on the first /docs hit
+docs_cache = DocsCache(app)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -63,28 +527,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets polling frontends read the status endpoint's ETag
+    expose_headers=["ETag"],
 )
 
 
+def record_gateway_redirect(trackId: str, url: str) -> None:
+    """Count and log a redirect to the Zibal payment gateway"""
+    REDIRECT_REQUESTS.inc()
+    log_event(logger, logging.INFO, "gateway.redirect", trackId=trackId, url=url)
+
+
+# Added last so it runs first: /health and /redirect/{trackId} skip FastAPI routing
+if settings.FAST_PATH_ENABLED:
+    app.add_middleware(
+        FastPathMiddleware,
+        gateway_url=settings.ZIBAL_PAYMENT_URL,
+        on_redirect=record_gateway_redirect
+    )
+
+
 # Scalar API Documentation
 @app.get("/docs", include_in_schema=False)
-async def scalar_html():
+async def scalar_html(request: Request):
     """API documentation with Scalar interface"""
-    return get_scalar_api_reference(
-        openapi_url=app.openapi_url,
-        title=app.title,
-    )
+    if not docs_cache.ready:
+        docs_cache.render()
+    return docs_cache.html.response(request)
 
 
-def create_signature(data: dict) -> str:
-    """Create HMAC signature for webhook security"""
-    message = f"{data['trackId']}:{data['success']}:{data['status']}"
-    signature = hmac.new(
-        settings.WEBHOOK_SECRET.encode(),
-        message.encode(),
-        hashlib.sha256
-    ).hexdigest()
-    return signature
+@app.get("/openapi.json", include_in_schema=False)
+async def openapi_json(request: Request):
+    """OpenAPI schema (prebuilt, with an ETag)"""
+    if not docs_cache.ready:
+        docs_cache.render()
+    return docs_cache.openapi.response(request)
+
+
+def webhook_delivery_stats(state) -> dict:
+    """Delivery counters for the configured webhook mode"""
+    stats = {"mode": settings.WEBHOOK_DELIVERY_MODE}
+    if state.webhook_queue is not None:
+        stats.update(state.webhook_queue.stats())
+    if state.webhook_outbox is not None:
+        stats.update(state.webhook_outbox.stats())
+    if state.webhook_batcher is not None:
+        stats.update(state.webhook_batcher.stats())
+    return stats
 
 
 @app.get("/")
@@ -100,9 +589,32 @@ async def root():
         "version": "1.0.0",
         "timestamp": datetime.utcnow().isoformat(),
         "documentation": "/docs",
+        "idempotency_cache": callback_cache.stats(),
+        "coalescing": callback_flights.stats(),
+        "payment_results": payment_results.stats(),
+        "admission": admission.stats(),
+        "state_store": (
+            app.state.callback_states.stats()
+            if app.state.callback_states is not None else None
+        ),
+        "webhook_delivery": webhook_delivery_stats(app.state),
+        "callback_outbox": (
+            app.state.callback_outbox.stats()
+            if app.state.callback_outbox is not None else None
+        ),
+        "retries": app.state.retry_policy.stats(),
+        "circuit_breakers": {
+            name: breaker.stats() for name, breaker in app.state.breakers.items()
+        },
+        "upstream_limits": {
+            name: limiter.stats() for name, limiter in app.state.limiters.items()
+        },
         "endpoints": {
             "health": "/health",
+            "readiness": "/health/ready",
             "callback": "/api/zibal/callback",
+            "payment_status": "/api/payments/{trackId}/status",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
@@ -111,9 +623,11 @@ async def root():
 @app.get("/health")
 async def health_check():
     """
-    Service health check
+    Service health check (liveness)
     
     This endpoint is used by monitoring systems to check service status.
+    It only reports that the process is serving requests; use
+    `/health/ready` to decide whether to route payments to this instance.
     
     Returns:
         dict: Service health status
@@ -121,6 +635,41 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/ready")
+async def readiness_check(request: Request):
+    """
+    Readiness check
+    
+    Returns 200 when Zibal and the ticketing API are reachable, their circuits
+    are not open and their connection pools are not saturated, and 503
+    otherwise. The verdict comes from a background prober that runs every
+    `READINESS_PROBE_INTERVAL` seconds, so this endpoint does no I/O.
+    """
+    readiness = request.app.state.readiness
+    return Response(
+        content=readiness.body,
+        status_code=readiness.status_code,
+        media_type="application/json"
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """
+    Prometheus metrics
+    
+    Request counts, per-phase latency histograms, outcome counters and
+    in-flight gauges in the Prometheus text exposition format. With several
+    workers the samples are totals across all of them.
+    """
+    shared_metrics = request.app.state.shared_metrics
+    if shared_metrics is not None:
+        body = await shared_metrics.render()
+    else:
+        body = metrics_registry.render()
+    return PlainTextResponse(body, media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/redirect/{trackId}")
 async def redirect_to_zibal(trackId: str):
     """
@@ -150,12 +699,7 @@ async def redirect_to_zibal(trackId: str):
         RedirectResponse: 303 redirect to Zibal gateway
     """
     zibal_gateway_url = f"{settings.ZIBAL_PAYMENT_URL}{trackId}"
-    
-    logger.info("="*100)
-    logger.info("🔀 REDIRECT REQUEST RECEIVED")
-    logger.info(f"📋 TrackId: {trackId}")
-    logger.info(f"🎯 Redirecting to: {zibal_gateway_url}")
-    logger.info("="*100)
+    record_gateway_redirect(trackId, zibal_gateway_url)
     
     return RedirectResponse(
         url=zibal_gateway_url,
@@ -163,9 +707,464 @@ async def redirect_to_zibal(trackId: str):
     )
 
 
+async def verify_payment(
+    upstreams: UpstreamClients,
+    trackId: str,
+    timeout: float = settings.UPSTREAM_TIMEOUT
+) -> dict:
+    """Verify a payment with Zibal and return the verify response body"""
+    verify_data = {
+        "merchant": settings.ZIBAL_MERCHANT_ID,
+        "trackId": int(trackId)
+    }
+    
+    verify_response = await upstreams.zibal.post(
+        settings.ZIBAL_VERIFY_URL,
+        json=verify_data,
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        },
+        timeout=timeout
+    )
+    
+    if verify_response.status_code >= 500:
+        verify_response.raise_for_status()
+    
+    return verify_response.json()
+
+
+async def remember_verified(state, trackId: str) -> None:
+    """Note that Zibal verified ``trackId``, in every process sharing the state store"""
+    verified_payments.set(trackId, True)
+    if state.callback_states is not None:
+        await state.callback_states.set("verified", trackId, True)
+
+
+async def was_verified(state, trackId: str) -> bool:
+    """Whether Zibal verified ``trackId`` in an earlier run"""
+    if verified_payments.get(trackId):
+        return True
+    if state.callback_states is not None:
+        return bool(await state.callback_states.get("verified", trackId))
+    return False
+
+
+async def defer_webhook(state, webhook_data: dict) -> bool:
+    """
+    Hand a webhook to background delivery (async queue or durable outbox)
+    
+    Returns:
+        bool: False if the webhook must be delivered inline instead
+    """
+    if state.webhook_outbox is not None:
+        try:
+            await state.webhook_outbox.add(webhook_data)
+        except Exception as e:
+            log_event(
+                logger, logging.ERROR, "webhook.outbox_unavailable",
+                trackId=webhook_data.get("trackId"), error=str(e)
+            )
+            return False
+        return True
+    
+    if state.webhook_queue is not None:
+        if await state.webhook_queue.enqueue(webhook_data):
+            return True
+        # Queue is full: deliver inline so the webhook is not dropped
+        log_event(
+            logger, logging.WARNING, "webhook.queue_full",
+            trackId=webhook_data.get("trackId")
+        )
+    
+    return False
+
+
+async def deliver_webhook_inline(state, webhook_data: dict, deadline: Deadline) -> dict:
+    """Deliver a webhook while the user waits, with retries within the deadline"""
+    WEBHOOK_IN_FLIGHT.inc()
+    phase_started = time.perf_counter()
+    try:
+        return await state.retry_policy.run(
+            lambda timeout: state.deliver_webhook(webhook_data, timeout),
+            deadline
+        )
+    finally:
+        WEBHOOK_IN_FLIGHT.dec()
+        WEBHOOK_DURATION.observe(time.perf_counter() - phase_started)
+
+
+def log_payloads(
+    trackId: str,
+    ok: bool,
+    verify_result: dict,
+    webhook_result: Optional[dict] = None
+) -> None:
+    """Log the full upstream payloads of a callback if the sampler selects it"""
+    if payload_sampler.should_log(trackId, ok):
+        log_event(
+            logger, logging.INFO if ok else logging.WARNING, "callback.payload",
+            trackId=trackId,
+            verify_result=verify_result,
+            webhook_result=webhook_result
+        )
+
+
+def success_redirect_url(trackId: str, webhook_result: Optional[dict] = None) -> str:
+    """
+    Frontend success page
+    
+    Carries the reservation from the ticketing API, or only the trackId when
+    the webhook is delivered in the background.
+    """
+    if webhook_result is None:
+        return f"{settings.TICKETING_FRONTEND_URL}/payment/success?trackId={trackId}"
+    return (
+        f"{settings.TICKETING_FRONTEND_URL}/payment/success"
+        f"?ref_id={webhook_result.get('ref_number')}"
+        f"&reservation_id={webhook_result.get('reservation_id')}"
+    )
+
+
+def failed_redirect_url(trackId: str, verify_result: dict) -> str:
+    """Frontend failure page for a payment Zibal did not verify"""
+    error_msg = verify_result.get("message", "Unknown error")
+    return (
+        f"{settings.TICKETING_FRONTEND_URL}/payment/failed"
+        f"?error={error_msg}"
+        f"&trackId={trackId}"
+    )
+
+
+def pending_redirect_url(
+    trackId: str,
+    success: int,
+    status: int,
+    orderId: Optional[str]
+) -> str:
+    """
+    Frontend pending page, for a callback still being processed
+    
+    Carries the callback's parameters, so the page can poll
+    ``/api/payments/{trackId}/status`` or send the callback again later.
+    """
+    query = {"trackId": trackId, "success": success, "status": status}
+    if orderId is not None:
+        query["orderId"] = orderId
+    return f"{settings.TICKETING_FRONTEND_URL}/payment/pending?{urlencode(query)}"
+
+
+async def process_payment(
+    state,
+    trackId: str,
+    success: int,
+    status: int,
+    orderId: Optional[str]
+) -> tuple[str, bool]:
+    """
+    Verify a payment with Zibal and forward the result to the ticketing API
+    
+    In ``async`` and ``outbox`` webhook modes the result is handed to background
+    delivery and the user is redirected as soon as Zibal has decided the
+    outcome; the success page then looks up the reservation by ``trackId``.
+    In ``sync`` mode the same happens while the ticketing API circuit is open.
+    
+    Returns:
+        tuple: Redirect URL for the user, and whether the decision is final.
+        A payment verified by Zibal but rejected by the ticketing API is not
+        final, so a repeated callback retries the delivery.
+    """
+    deadline = Deadline(settings.CALLBACK_DEADLINE)
+    retry_policy: RetryPolicy = state.retry_policy
+    
+    # Step 1: Verify payment with Zibal
+    verify_attempts = 0
+    
+    async def verify_attempt(timeout: float) -> dict:
+        nonlocal verify_attempts
+        async with state.limiters["zibal"].slot(timeout) as waited:
+            verify_attempts += 1
+            timeout = max(timeout - waited, 0.001)
+            return await state.breakers["zibal"].call(
+                lambda: asyncio.wait_for(
+                    verify_payment(state.upstreams, trackId, timeout), timeout
+                )
+            )
+    
+    VERIFY_IN_FLIGHT.inc()
+    phase_started = time.perf_counter()
+    try:
+        verify_result = await retry_policy.run(verify_attempt, deadline)
+    finally:
+        VERIFY_IN_FLIGHT.dec()
+        VERIFY_DURATION.observe(time.perf_counter() - phase_started)
+    verify_ms = elapsed_ms(phase_started)
+    if verify_result.get("result") == 100:
+        VERIFY_RESULT_OK.inc()
+    else:
+        VERIFY_RESULTS.labels(verify_result.get("result")).inc()
+    # 201 ("already verified") on a retry means an earlier attempt succeeded
+    # but its response was lost; on a replay, that an earlier run got 100
+    # but failed to deliver the webhook
+    verified = verify_result.get("result") == 100
+    if verified:
+        await remember_verified(state, trackId)
+    elif verify_result.get("result") == 201:
+        verified = verify_attempts > 1 or await was_verified(state, trackId)
+    # A 201 with no record of the earlier success (expired, or the store was
+    # unreachable) settles nothing: the user sees a failure, but a repeated
+    # callback decides again
+    unconfirmed = verify_result.get("result") == 201 and not verified
+    log_event(
+        logger, logging.INFO, "callback.verify",
+        trackId=trackId,
+        result=verify_result.get("result"),
+        verified=verified,
+        attempts=verify_attempts,
+        duration_ms=verify_ms
+    )
+    
+    # Step 2: Forward to ticketing API
+    webhook_data = build_webhook_data(trackId, success, status, orderId, verify_result)
+    
+    webhook_result = None
+    phase_started = time.perf_counter()
+    try:
+        if settings.WEBHOOK_DELIVERY_MODE == "sync":
+            try:
+                webhook_result = await deliver_webhook_inline(state, webhook_data, deadline)
+            except (CircuitOpenError, UpstreamBusyError):
+                # Ticketing API circuit is open or it is saturated: defer
+                # instead of failing the user
+                pass
+        
+        if webhook_result is None:
+            if await defer_webhook(state, webhook_data):
+                log_event(
+                    logger, logging.INFO, "callback.webhook",
+                    trackId=trackId,
+                    delivery="deferred",
+                    duration_ms=elapsed_ms(phase_started)
+                )
+                log_payloads(trackId, verified, verify_result)
+                if verified:
+                    redirect_url = success_redirect_url(trackId)
+                else:
+                    redirect_url = failed_redirect_url(trackId, verify_result)
+                final = not unconfirmed
+                await payment_results.record(trackId, PAID if verified else FAILED, final)
+                return redirect_url, final
+            
+            webhook_result = await deliver_webhook_inline(state, webhook_data, deadline)
+    except Exception:
+        log_payloads(trackId, False, verify_result)
+        raise
+    
+    log_event(
+        logger, logging.INFO, "callback.webhook",
+        trackId=trackId,
+        delivery="inline",
+        success=webhook_result.get("success"),
+        duration_ms=elapsed_ms(phase_started)
+    )
+    paid = verified and bool(webhook_result.get("success"))
+    log_payloads(trackId, paid, verify_result, webhook_result)
+    
+    # Step 3: Decide where to redirect the user
+    if paid:
+        # Payment successful
+        redirect_url = success_redirect_url(trackId, webhook_result)
+    else:
+        # Payment failed
+        redirect_url = failed_redirect_url(trackId, verify_result)
+    final = (paid or not verified) and not unconfirmed
+    await payment_results.record(trackId, PAID if paid else FAILED, final)
+    return redirect_url, final
+
+
+async def run_callback(
+    state,
+    trackId: str,
+    success: int,
+    status: int,
+    orderId: Optional[str]
+) -> tuple[str, bool]:
+    """
+    One run of the callback pipeline, publishing a final decision
+    
+    Returns:
+        tuple: Redirect URL for the user, and whether the decision is final
+    """
+    states = state.callback_states
+    claimed = True
+    if states is not None:
+        # Waits for another process handling this trackId, and reuses its
+        # decision or takes over if it left none
+        redirect_url, claimed = await states.begin(trackId)
+        if redirect_url is not None:
+            log_event(
+                logger, logging.DEBUG, "callback.cache_hit", trackId=trackId, source="store"
+            )
+            callback_cache.set(trackId, redirect_url)
+            return redirect_url, True
+    
+    decision = None
+    await payment_results.record(trackId, PROCESSING, False)
+    try:
+        redirect_url, final = await process_payment(
+            state, trackId, success, status, orderId
+        )
+        if final:
+            callback_cache.set(trackId, redirect_url)
+            decision = redirect_url
+        return redirect_url, final
+    except Exception:
+        # Not final: a repeated callback retries it
+        await payment_results.record(trackId, ERROR, False)
+        raise
+    finally:
+        if claimed and states is not None:
+            await states.finish(trackId, decision)
+
+
+async def resolve_callback(
+    state,
+    trackId: str,
+    success: int,
+    status: int,
+    orderId: Optional[str]
+) -> str:
+    """
+    Work out where to redirect the user for a callback not in the local cache
+    
+    Coalesces concurrent callbacks and turns upstream failures into a
+    failure-page redirect. With a state store (several workers or replicas)
+    the idempotency cache and the coalescing extend to every process sharing
+    it. A run still going after ``CALLBACK_PENDING_AFTER`` seconds finishes
+    in the background and the user gets the pending page.
+    """
+    params = {"trackId": trackId, "success": success, "status": status, "orderId": orderId}
+    run = callback_flights.do(trackId, lambda: run_callback(state, **params))
+    
+    pending_after = settings.CALLBACK_PENDING_AFTER
+    if pending_after <= 0:
+        return await settle_callback(state, params, run)
+    
+    started = time.perf_counter()
+    outcome = asyncio.ensure_future(settle_callback(state, params, run))
+    done, _ = await asyncio.wait({outcome}, timeout=pending_after)
+    if done:
+        return outcome.result()
+    
+    # Over the SLO: the run goes on without this request and publishes its
+    # decision to the caches as usual
+    log_event(
+        logger, logging.INFO, "callback.pending",
+        trackId=trackId, waited_ms=elapsed_ms(started)
+    )
+    outcome.add_done_callback(
+        lambda task: log_event(
+            logger, logging.INFO, "callback.background_complete",
+            trackId=trackId,
+            redirect=None if task.cancelled() else task.result(),
+            duration_ms=elapsed_ms(started)
+        )
+    )
+    return pending_redirect_url(**params)
+
+
+async def settle_callback(state, params: dict, run: Awaitable[tuple[str, bool]]) -> str:
+    """
+    The redirect URL a callback run produces, or a failure page if it raises
+    
+    A callback stopped by the open Zibal circuit is stored in the callback
+    outbox, if there is one, and the user gets the pending page instead.
+    """
+    trackId = params["trackId"]
+    try:
+        redirect_url, _ = await run
+        return redirect_url
+    except (CircuitOpenError, UpstreamBusyError) as e:
+        log_event(
+            logger, logging.WARNING, "callback.error",
+            trackId=trackId,
+            error="circuit_open" if isinstance(e, CircuitOpenError) else "upstream_busy",
+            detail=str(e)
+        )
+        if isinstance(e, CircuitOpenError) and await defer_callback(state, params):
+            return pending_redirect_url(**params)
+        return (
+            f"{settings.TICKETING_FRONTEND_URL}/payment/failed"
+            f"?error=Service+unavailable&trackId={trackId}"
+        )
+    except (
+        httpx.RequestError,
+        httpx.HTTPStatusError,
+        asyncio.TimeoutError,
+        DeadlineExceeded
+    ) as e:
+        log_event(
+            logger, logging.ERROR, "callback.error",
+            trackId=trackId, error=type(e).__name__, detail=str(e)
+        )
+        return f"{settings.TICKETING_FRONTEND_URL}/payment/failed?error=Connection+error"
+    except Exception as e:
+        log_event(
+            logger, logging.ERROR, "callback.error", exc_info=True,
+            trackId=trackId, error=type(e).__name__, detail=str(e)
+        )
+        return f"{settings.TICKETING_FRONTEND_URL}/payment/failed?error=System+error"
+
+
+async def defer_callback(state, params: dict) -> bool:
+    """
+    Store a callback in the callback outbox, to be run once Zibal recovers
+    
+    Returns:
+        bool: False if there is no callback outbox or it could not be written
+    """
+    if state.callback_outbox is None:
+        return False
+    trackId = params["trackId"]
+    try:
+        await state.callback_outbox.add(params)
+    except Exception as e:
+        log_event(
+            logger, logging.ERROR, "callback.outbox_unavailable",
+            trackId=trackId, error=str(e)
+        )
+        return False
+    await payment_results.record(trackId, PROCESSING, False)
+    log_event(logger, logging.INFO, "callback.deferred", trackId=trackId)
+    return True
+
+
+def shed_response(request: Request, trackId: str, reason: str) -> Response:
+    """Response for a callback shed by admission control"""
+    log_event(
+        logger, logging.DEBUG, "callback.shed",
+        trackId=trackId, reason=reason, client=request.client.host if request.client else None
+    )
+    if settings.ADMISSION_OVERFLOW_RESPONSE == "503":
+        return JSONResponse(
+            {"detail": "Too many callbacks, retry shortly"},
+            status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)}
+        )
+    # The retry page gets the original callback query so it can send it again
+    retry_url = settings.ADMISSION_RETRY_URL or f"{settings.TICKETING_FRONTEND_URL}/payment/retry"
+    return RedirectResponse(
+        url=f"{retry_url}?{request.url.query}",
+        status_code=http_status.HTTP_303_SEE_OTHER
+    )
+
+
 @app.get("/api/zibal/callback")
 async def zibal_callback(
-    trackId: str,
+    request: Request,
+    # Zibal trackIds are numeric; anything else is rejected with 422 before
+    # admission control or any upstream call
+    trackId: Annotated[str, Query(pattern=r"^[0-9]{1,20}$")],
     success: int,
     status: int,
     orderId: Optional[str] = None
@@ -184,7 +1183,7 @@ async def zibal_callback(
     
     ## Parameters:
     
-    - **trackId**: Unique transaction ID in Zibal
+    - **trackId**: Unique transaction ID in Zibal (digits only)
     - **success**: Payment success status (1 = success, 0 = failed)
     - **status**: Transaction status code
     - **orderId**: Order ID (optional)
@@ -193,118 +1192,119 @@ async def zibal_callback(
     
     303 redirect to success or failure page in your frontend
     
+    ## Idempotency:
+    
+    The redirect decision for each `trackId` is cached for `IDEMPOTENCY_CACHE_TTL`
+    seconds. Repeated callbacks (Zibal retries, back button, refreshes) get the
+    same redirect without calling Zibal or the ticketing API again. Callbacks
+    for a `trackId` that is still being processed wait for that run and get
+    its redirect.
+    
     ## Security Notes:
     
     - All requests are signed with HMAC-SHA256
     - Double verification: both from Zibal and in your main API
-    - Complete logging of all steps for monitoring and debugging
-    """
-    logger.info("="*100)
-    logger.info("🔔 ZIBAL CALLBACK RECEIVED AT PROXY")
-    logger.info(f"📋 Parameters:")
-    logger.info(f"   - trackId: {trackId}")
-    logger.info(f"   - success: {success}")
-    logger.info(f"   - status: {status}")
-    logger.info(f"   - orderId: {orderId}")
-    logger.info("="*100)
+    - One structured JSON log record per phase (verify, webhook, completion)
     
-    try:
-        # Step 1: Verify payment with Zibal
-        logger.info("🔄 Verifying payment with Zibal...")
-        
-        async with httpx.AsyncClient() as client:
-            verify_data = {
-                "merchant": settings.ZIBAL_MERCHANT_ID,
-                "trackId": int(trackId)
-            }
-            
-            logger.info(f"📤 Sending verify request: {verify_data}")
-            
-            verify_response = await client.post(
-                settings.ZIBAL_VERIFY_URL,
-                json=verify_data,
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json"
-                },
-                timeout=15.0
-            )
-            
-            verify_result = verify_response.json()
-            logger.info(f"📥 Zibal verify response: {verify_result}")
-            
-            # Step 2: Forward to ticketing API
-            logger.info("📨 Forwarding to ticketing API...")
-            
-            # Prepare webhook data
-            webhook_data = {
-                "trackId": trackId,
-                "success": success,
-                "status": status,
-                "orderId": orderId,
-                "verifyResult": verify_result,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            
-            # Add signature for security
-            signature = create_signature(webhook_data)
-            
-            webhook_response = await client.post(
-                f"{settings.TICKETING_API_URL}/api/v1/payments/zibal-webhook",
-                json=webhook_data,
-                headers={
-                    "Content-Type": "application/json",
-                    "X-Webhook-Signature": signature
-                },
-                timeout=15.0
-            )
-            
-            webhook_result = webhook_response.json()
-            logger.info(f"✅ Ticketing API response: {webhook_result}")
-            
-            # Step 3: Redirect user
-            if verify_result.get("result") == 100 and webhook_result.get("success"):
-                # Payment successful
-                logger.info("🎉 Payment successful - redirecting to success page")
-                redirect_url = (
-                    f"{settings.TICKETING_FRONTEND_URL}/payment/success"
-                    f"?ref_id={webhook_result.get('ref_number')}"
-                    f"&reservation_id={webhook_result.get('reservation_id')}"
-                )
-            else:
-                # Payment failed
-                logger.info("❌ Payment failed - redirecting to failure page")
-                error_msg = verify_result.get("message", "Unknown error")
-                redirect_url = (
-                    f"{settings.TICKETING_FRONTEND_URL}/payment/failed"
-                    f"?error={error_msg}"
-                    f"&trackId={trackId}"
-                )
-            
-            logger.info(f"🔀 Redirecting to: {redirect_url}")
-            logger.info("="*100)
-            
-            return RedirectResponse(
-                url=redirect_url,
-                status_code=http_status.HTTP_303_SEE_OTHER
+    ## Admission control:
+    
+    Callbacks beyond `ADMISSION_MAX_IN_FLIGHT` in flight, or beyond a client
+    address's token bucket (if enabled), are shed without calling Zibal:
+    answered with 503, or redirected to the retry page with the same query.
+    Repeated callbacks answered from the idempotency cache are never shed.
+    
+    ## Latency SLO:
+    
+    With `CALLBACK_PENDING_AFTER` set, a callback not decided within that many
+    seconds is redirected to `/payment/pending` with the same parameters while
+    verification and webhook delivery finish in the background. Sending the
+    callback again then returns the final redirect once it is decided.
+    """
+    CALLBACK_REQUESTS.inc()
+    started = time.perf_counter()
+    # Repeated callbacks cost nothing, so they skip admission control
+    redirect_url = callback_cache.get(trackId)
+    if redirect_url is not None:
+        log_event(logger, logging.DEBUG, "callback.cache_hit", trackId=trackId, source="local")
+        CALLBACK_DURATION.observe(time.perf_counter() - started)
+    else:
+        reason = admission.admit(request.client.host if request.client else None)
+        if reason is not None:
+            return shed_response(request, trackId, reason)
+        CALLBACK_IN_FLIGHT.inc()
+        try:
+            redirect_url = await resolve_callback(
+                request.app.state, trackId, success, status, orderId
             )
-            
-    except httpx.RequestError as e:
-        logger.error(f"❌ Network error: {str(e)}")
-        return RedirectResponse(
-            url=f"{settings.TICKETING_FRONTEND_URL}/payment/failed?error=Connection+error",
-            status_code=http_status.HTTP_303_SEE_OTHER
-        )
-    except Exception as e:
-        logger.error(f"❌ Unexpected error: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
-        return RedirectResponse(
-            url=f"{settings.TICKETING_FRONTEND_URL}/payment/failed?error=System+error",
-            status_code=http_status.HTTP_303_SEE_OTHER
+        finally:
+            admission.release()
+            CALLBACK_IN_FLIGHT.dec()
+            CALLBACK_DURATION.observe(time.perf_counter() - started)
+    
+    if "/payment/success" in redirect_url:
+        target = "success"
+        REDIRECT_SUCCESS.inc()
+    elif "/payment/pending" in redirect_url:
+        target = "pending"
+        REDIRECT_PENDING.inc()
+    else:
+        target = "failed"
+        REDIRECT_FAILED.inc()
+    
+    log_event(
+        logger, logging.INFO, "callback.complete",
+        trackId=trackId,
+        success=success,
+        status=status,
+        orderId=orderId,
+        target=target,
+        redirect=redirect_url,
+        duration_ms=elapsed_ms(started)
+    )
+    
+    return RedirectResponse(
+        url=redirect_url,
+        status_code=http_status.HTTP_303_SEE_OTHER
+    )
+
+
+@app.get("/api/payments/{trackId}/status")
+async def payment_status(
+    trackId: Annotated[str, Path(pattern=r"^[0-9]{1,20}$")],
+    request: Request
+):
+    """
+    Latest known outcome of a payment
+    
+    Served from the result store filled by the callback pipeline, so polling
+    never calls Zibal or the ticketing API.
+    
+    ## Response:
+    
+    - **trackId**: Transaction ID in Zibal
+    - **status**: `processing`, `paid`, `failed` or `error`
+    - **final**: Whether the outcome is settled; a repeated callback retries
+      payments that are not
+    - **updated_at**: Unix time of the last change
+    
+    Only the outcome is returned; reservation details stay with the
+    ticketing API. Like the callback endpoint, this one is unauthenticated:
+    anyone who knows a trackId can read its outcome.
+    
+    ## Caching:
+    
+    Responses carry an `ETag`; send it back in `If-None-Match` to get `304 Not
+    Modified` until the result changes. Unknown (or expired) trackIds get 404.
+    """
+    document = await payment_results.get(trackId)
+    if document is None:
+        raise HTTPException(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            detail="No result for this trackId"
         )
+    return document.response(request)
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import runner
+    runner.main()
@@ -0,0 +1,339 @@
+"""
+Prometheus-style metrics
+Counters, gauges and fixed-bucket histograms cheap enough for the hot path,
+rendered in the Prometheus text exposition format
+"""
+
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from a fast cache hit to the full callback deadline
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Child metric for one label combination
+
+        Resolve children once (e.g. at import time) and keep the reference, so
+        recording on the hot path is a plain attribute update.
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def samples(self) -> Iterable[tuple[str, float]]:
+        """(series, value) pairs, e.g. ``('name{label="x"}', 3)``"""
+        for key, child in self._children.items():
+            yield from self._child_samples(key, child)
+
+    def _child_samples(self, key: tuple, child) -> Iterable[tuple[str, float]]:
+        yield f"{self.name}{_format_labels(self.labelnames, key)}", child.value
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. requests in flight"""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self._default.value -= amount
+
+    def set(self, value: float) -> None:
+        self._default.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow slot
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram
+
+    Observing a value is a binary search over a preallocated bucket tuple and
+    three in-place increments; cumulative counts are computed at scrape time.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple = (),
+        buckets: tuple = LATENCY_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _child_samples(self, key: tuple, child) -> Iterable[tuple[str, float]]:
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+            yield f"{self.name}_bucket{labels}", cumulative
+        labels = _format_labels(self.labelnames, key)
+        yield f"{self.name}_sum{labels}", child.sum
+        yield f"{self.name}_count{labels}", child.count
+
+
+class CollectorMetric:
+    """
+    Metric whose samples are read from a callback at scrape time
+
+    Used to expose counters that already live elsewhere (cache, breakers,
+    delivery queue) without touching them on the hot path.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labelnames: tuple,
+        collect: Callable[[], Iterable[tuple]]
+    ):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+
+    def samples(self) -> Iterable[tuple[str, float]]:
+        for labelvalues, value in self._collect():
+            yield f"{self.name}{_format_labels(self.labelnames, tuple(labelvalues))}", value
+
+
+class Registry:
+    """Set of metrics rendered together by the /metrics endpoint"""
+
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+
+    def register(self, metric):
+        """Add a metric (replacing one with the same name) and return it"""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple = (),
+        buckets: Optional[tuple] = None
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets or LATENCY_BUCKETS))
+
+    def collector(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labelnames: tuple,
+        collect: Callable[[], Iterable[tuple]]
+    ) -> CollectorMetric:
+        return self.register(CollectorMetric(name, help, kind, labelnames, collect))
+
+    def snapshot(self) -> dict[str, list]:
+        """Current samples of every metric, as JSON-serializable lists"""
+        return {name: list(metric.samples()) for name, metric in self._metrics.items()}
+
+    def render(self, others: Iterable[dict] = ()) -> str:
+        """
+        All metrics in the Prometheus text exposition format
+
+        ``others`` are snapshots from other worker processes; their samples
+        are added to the local ones series by series. Counters and histograms
+        become service-wide totals, and gauges are summed too (so a per-state
+        gauge counts the workers in that state).
+        """
+        others = list(others)
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            samples = metric.samples()
+            if others:
+                merged = dict(samples)
+                for snapshot in others:
+                    for series, value in snapshot.get(name, ()):
+                        merged[series] = merged.get(series, 0) + value
+                samples = merged.items()
+            lines.extend(f"{series} {_format_value(value)}" for series, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+# Service metrics
+
+registry = Registry()
+
+CALLBACK_REQUESTS = registry.counter(
+    "payment_proxy_callback_requests_total",
+    "Zibal callbacks received"
+)
+CALLBACK_DURATION = registry.histogram(
+    "payment_proxy_callback_duration_seconds",
+    "Time to answer a Zibal callback"
+)
+CALLBACK_IN_FLIGHT = registry.gauge(
+    "payment_proxy_callback_in_flight",
+    "Zibal callbacks currently being handled"
+)
+CALLBACK_REDIRECTS = registry.counter(
+    "payment_proxy_callback_redirects_total",
+    "Callback redirects by target page",
+    ("target",)
+)
+VERIFY_DURATION = registry.histogram(
+    "payment_proxy_verify_duration_seconds",
+    "Zibal verify phase duration, including retries"
+)
+VERIFY_IN_FLIGHT = registry.gauge(
+    "payment_proxy_verify_in_flight",
+    "Zibal verify phases in progress"
+)
+VERIFY_RESULTS = registry.counter(
+    "payment_proxy_verify_results_total",
+    "Zibal verify responses by result code",
+    ("result",)
+)
+WEBHOOK_DURATION = registry.histogram(
+    "payment_proxy_webhook_duration_seconds",
+    "Inline ticketing webhook phase duration, including retries"
+)
+WEBHOOK_IN_FLIGHT = registry.gauge(
+    "payment_proxy_webhook_in_flight",
+    "Inline ticketing webhook phases in progress"
+)
+BREAKER_TRANSITIONS = registry.counter(
+    "payment_proxy_circuit_transitions_total",
+    "Circuit breaker state changes",
+    ("upstream", "from_state", "to_state")
+)
+UPSTREAM_QUEUE_WAIT = registry.histogram(
+    "payment_proxy_upstream_queue_wait_seconds",
+    "Time spent waiting for an upstream concurrency slot",
+    ("upstream",)
+)
+REDIRECT_REQUESTS = registry.counter(
+    "payment_proxy_gateway_redirects_total",
+    "Redirects to the Zibal payment gateway"
+)
+
+# Pre-resolved children for the hot path
+REDIRECT_SUCCESS = CALLBACK_REDIRECTS.labels("success")
+REDIRECT_FAILED = CALLBACK_REDIRECTS.labels("failed")
+REDIRECT_PENDING = CALLBACK_REDIRECTS.labels("pending")
+VERIFY_RESULT_OK = VERIFY_RESULTS.labels("100")
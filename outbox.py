@@ -0,0 +1,329 @@
+"""
+Durable webhook outbox
+Verified payments are committed to a local SQLite database (WAL mode) before
+delivery, and background dispatchers (one per worker sharing the file)
+claim and deliver them to the ticketing API
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+from breaker import CircuitOpenError
+from logging_setup import log_event
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[dict], Awaitable[dict]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    track_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    delivered_at REAL,
+    last_error TEXT,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_outbox_pending
+    ON webhook_outbox (status, next_attempt_at);
+"""
+
+
+class WebhookOutbox:
+    """
+    SQLite-backed outbox with group commits and a concurrent dispatcher
+
+    ``add`` returns only after the row is committed, so a verified payment
+    survives a crash. Concurrent ``add`` calls are collected for up to
+    ``batch_window`` seconds (or ``batch_size`` rows) and committed in one
+    transaction. All database work runs on a single dedicated thread, off
+    the event loop.
+
+    Rows move from ``pending`` to ``dispatching`` when a dispatcher claims
+    them, then to ``delivered``, back to ``pending`` for a retry, or to
+    ``failed`` after ``max_attempts`` so they can be reconciled by hand.
+    Claiming is one atomic UPDATE, so workers sharing the file never deliver
+    the same row twice. A claim is a lease of ``lease_seconds``: rows held
+    by a process that died are claimed again once it expires, and pending
+    rows left over from a previous run are picked up on start.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        deliver: Deliver,
+        batch_size: int = 256,
+        batch_window: float = 0.002,
+        concurrency: int = 8,
+        poll_interval: float = 1.0,
+        max_attempts: int = 20,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 300.0,
+        retention: float = 7 * 24 * 3600,
+        lease_seconds: float = 600.0,
+        busy_timeout: float = 30.0
+    ):
+        self.path = path
+        self._deliver = deliver
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.retention = retention
+        self.lease_seconds = lease_seconds
+        self.busy_timeout = busy_timeout
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox-db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending_writes: asyncio.Queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self.written = 0
+        self.commits = 0
+        self.delivered = 0
+        self.retries = 0
+        self.deferred = 0
+        self.failed = 0
+
+    async def _db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _open(self) -> None:
+        # Other workers may hold the write lock briefly: wait instead of failing
+        self._conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across process crashes in WAL mode
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # Outbox files created before rows were claimed
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(webhook_outbox)")}
+        for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE webhook_outbox ADD COLUMN {column} {kind}")
+        self._conn.commit()
+
+    async def start(self, dispatch: bool = True) -> None:
+        """Open the database and start the writer and dispatcher tasks"""
+        await self._db(self._open)
+        self._tasks.append(asyncio.create_task(self._writer(), name="outbox-writer"))
+        if dispatch:
+            self._tasks.append(
+                asyncio.create_task(self._dispatcher(), name="outbox-dispatcher")
+            )
+        pending = await self._db(self._count_pending)
+        if pending:
+            log_event(logger, logging.INFO, "outbox.resuming", pending=pending)
+
+    async def stop(self) -> None:
+        """Stop background tasks and close the database"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._conn is not None:
+            await self._db(self._release_claims)
+            await self._db(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
+
+    async def add(self, webhook_data: dict) -> None:
+        """Durably record a webhook; returns once its row is committed"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending_writes.put_nowait((webhook_data, future))
+        await future
+
+    # Writer: group commit of concurrent inserts
+
+    async def _writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._pending_writes.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._pending_writes.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._db(self._insert, [item for item, _ in batch])
+            except Exception as e:
+                log_event(
+                    logger, logging.ERROR, "outbox.write_failed",
+                    items=len(batch), error=str(e)
+                )
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+            self._wakeup.set()
+
+    def _insert(self, items: list) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "INSERT INTO webhook_outbox (track_id, payload, next_attempt_at, created_at)"
+            " VALUES (?, ?, ?, ?)",
+            [
+                (str(item.get("trackId")), json.dumps(item), now, now)
+                for item in items
+            ]
+        )
+        self._conn.commit()
+        self.written += len(items)
+        self.commits += 1
+
+    # Dispatcher: deliver pending rows concurrently
+
+    async def _dispatcher(self) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        last_purge = 0.0
+        while True:
+            rows = await self._db(self._claim_due, self.batch_size)
+            if rows:
+                outcomes = await asyncio.gather(
+                    *(self._deliver_row(semaphore, row) for row in rows)
+                )
+                await self._db(self._record_outcomes, outcomes)
+                continue
+            if time.time() - last_purge > 3600:
+                await self._db(self._purge_delivered)
+                last_purge = time.time()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver_row(self, semaphore: asyncio.Semaphore, row: tuple) -> tuple:
+        row_id, track_id, payload, attempts = row
+        async with semaphore:
+            try:
+                result = await self._deliver(json.loads(payload))
+            except asyncio.CancelledError:
+                raise
+            except CircuitOpenError as e:
+                # Nothing was sent, so this is not an attempt: wait out the breaker
+                return row_id, track_id, attempts, str(e), max(e.retry_after, self.retry_delay)
+            except Exception as e:
+                return row_id, track_id, attempts + 1, str(e), None
+        log_event(
+            logger, logging.INFO, "outbox.delivered",
+            trackId=track_id, attempts=attempts + 1, success=result.get("success")
+        )
+        return row_id, track_id, attempts + 1, None, None
+
+    def _claim_due(self, limit: int) -> list:
+        # One statement under SQLite's write lock: no other worker can claim
+        # the same rows in between
+        now = time.time()
+        rows = self._conn.execute(
+            "UPDATE webhook_outbox SET status = 'dispatching', owner = ?, lease_until = ?"
+            " WHERE id IN ("
+            "  SELECT id FROM webhook_outbox"
+            "  WHERE (status = 'pending' AND next_attempt_at <= ?)"
+            "   OR (status = 'dispatching' AND lease_until <= ?)"
+            "  ORDER BY next_attempt_at LIMIT ?"
+            " ) RETURNING id, track_id, payload, attempts",
+            (self.owner, now + self.lease_seconds, now, now, limit)
+        ).fetchall()
+        self._conn.commit()
+        return rows
+
+    def _record_outcomes(self, outcomes: list) -> None:
+        now = time.time()
+        delivered, retry, deferrals, failed = [], [], [], []
+        for row_id, track_id, attempts, error, deferred in outcomes:
+            if error is None:
+                delivered.append((now, attempts, row_id))
+            elif deferred is not None:
+                deferrals.append((attempts, error, now + deferred, row_id))
+            elif attempts >= self.max_attempts:
+                failed.append((attempts, error, row_id))
+                log_event(
+                    logger, logging.ERROR, "outbox.failed",
+                    trackId=track_id, attempts=attempts, error=error
+                )
+            else:
+                delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+                retry.append((attempts, error, now + delay, row_id))
+                log_event(
+                    logger, logging.WARNING, "outbox.retry",
+                    trackId=track_id, attempts=attempts, error=error, delay_s=delay
+                )
+        # Rows are only updated while this dispatcher still holds their claim
+        owner = self.owner
+        self._conn.executemany(
+            "UPDATE webhook_outbox SET status = 'delivered', delivered_at = ?,"
+            " attempts = ?, last_error = NULL, owner = NULL WHERE id = ? AND owner = ?",
+            [(*row, owner) for row in delivered]
+        )
+        self._conn.executemany(
+            "UPDATE webhook_outbox SET status = 'pending', attempts = ?, last_error = ?,"
+            " next_attempt_at = ?, owner = NULL WHERE id = ? AND owner = ?",
+            [(*row, owner) for row in retry + deferrals]
+        )
+        self._conn.executemany(
+            "UPDATE webhook_outbox SET status = 'failed', attempts = ?,"
+            " last_error = ?, owner = NULL WHERE id = ? AND owner = ?",
+            [(*row, owner) for row in failed]
+        )
+        self._conn.commit()
+        self.delivered += len(delivered)
+        self.retries += len(retry)
+        self.deferred += len(deferrals)
+        self.failed += len(failed)
+
+    def _release_claims(self) -> None:
+        # Deliveries cut short by shutdown go back to pending for any worker
+        self._conn.execute(
+            "UPDATE webhook_outbox SET status = 'pending', owner = NULL"
+            " WHERE status = 'dispatching' AND owner = ?",
+            (self.owner,)
+        )
+        self._conn.commit()
+
+    def _count_pending(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM webhook_outbox WHERE status IN ('pending', 'dispatching')"
+        ).fetchone()[0]
+
+    def _purge_delivered(self) -> None:
+        self._conn.execute(
+            "DELETE FROM webhook_outbox WHERE status = 'delivered' AND delivered_at < ?",
+            (time.time() - self.retention,)
+        )
+        self._conn.commit()
+
+    def stats(self) -> dict:
+        """Write and delivery counters"""
+        return {
+            "written": self.written,
+            "commits": self.commits,
+            "delivered": self.delivered,
+            "retries": self.retries,
+            "deferred": self.deferred,
+            "failed": self.failed,
+        }
@@ -0,0 +1,136 @@
+"""
+Readiness probing
+A background task checks upstream reachability, circuit state and connection
+pool saturation on an interval and keeps a prebuilt readiness response, so
+the readiness endpoint never does I/O itself
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Iterable, Optional
+
+import httpx
+
+from breaker import CircuitBreaker
+from http_clients import pool_stats
+from logging_setup import log_event
+
+logger = logging.getLogger(__name__)
+
+
+class Upstream:
+    """An upstream to probe: its shared client, probe URL and circuit breaker"""
+
+    def __init__(self, client: httpx.AsyncClient, probe_url: str, breaker: CircuitBreaker):
+        self.client = client
+        self.probe_url = probe_url
+        self.breaker = breaker
+
+
+class ReadinessProber:
+    """
+    Probe upstreams every ``interval`` seconds and cache the readiness verdict
+
+    An upstream counts as reachable when a GET of its probe URL gets any
+    response below 500 within ``timeout``; probes bypass the circuit
+    breakers so they never affect them. The instance is ready when every
+    upstream in ``required`` was reachable on the last probe, its circuit
+    is not open, and its connection pool is not saturated (all connections
+    busy and requests queued). Until the first probe finishes the instance
+    is not ready.
+    """
+
+    def __init__(
+        self,
+        upstreams: dict[str, Upstream],
+        required: Iterable[str] = (),
+        interval: float = 5.0,
+        timeout: float = 2.0,
+        clock: Callable[[], float] = time.time
+    ):
+        self.upstreams = upstreams
+        self.required = frozenset(required)
+        self.interval = interval
+        self.timeout = timeout
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+        self.ready = False
+        self.report: dict = {"status": "starting", "upstreams": {}}
+        self.body = json.dumps(self.report).encode()
+        self.probes = 0
+
+    @property
+    def status_code(self) -> int:
+        """HTTP status for the readiness endpoint"""
+        return 200 if self.ready else 503
+
+    def start(self) -> None:
+        """Start probing in the background, beginning immediately"""
+        self._task = asyncio.create_task(self._run(), name="readiness-prober")
+
+    async def stop(self) -> None:
+        """Stop background probing"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                log_event(logger, logging.ERROR, "readiness.probe_failed", error=str(e))
+            await asyncio.sleep(self.interval)
+
+    async def _check(self, upstream: Upstream) -> dict:
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                upstream.client.get(upstream.probe_url, timeout=self.timeout),
+                self.timeout
+            )
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            return {"reachable": False, "error": str(e) or type(e).__name__}
+        return {
+            "reachable": response.status_code < 500,
+            "status_code": response.status_code,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    async def probe(self) -> None:
+        """Probe every upstream once and rebuild the readiness response"""
+        names = list(self.upstreams)
+        checks = await asyncio.gather(*(self._check(self.upstreams[n]) for n in names))
+        report = {}
+        ready = True
+        for name, check in zip(names, checks):
+            upstream = self.upstreams[name]
+            pool = pool_stats(upstream.client)
+            saturated = (
+                pool["connections"] >= pool["max_connections"]
+                and pool["queued_requests"] > 0
+            )
+            # is_open also moves an expired open circuit to half-open
+            circuit_open = upstream.breaker.is_open
+            circuit = upstream.breaker.state
+            healthy = check["reachable"] and not circuit_open and not saturated
+            if name in self.required and not healthy:
+                ready = False
+            report[name] = {**check, "circuit": circuit, "pool": pool, "saturated": saturated}
+
+        if ready != self.ready:
+            log_event(
+                logger, logging.INFO if ready else logging.WARNING,
+                "readiness.changed", ready=ready
+            )
+        self.ready = ready
+        self.probes += 1
+        self.report = {
+            "status": "ready" if ready else "not_ready",
+            "checked_at": self._clock(),
+            "upstreams": report,
+        }
+        self.body = json.dumps(self.report).encode()
@@ -0,0 +1,116 @@
+"""
+Payment results
+Latest known outcome per trackId, recorded by the callback pipeline and
+served to polling frontends as prerendered JSON with an ETag
+"""
+
+import json
+import logging
+import time
+from typing import Callable, Optional
+
+from cache import TTLCache
+from docs import CachedDocument
+from logging_setup import log_event
+from state_store import StateStore, StateStoreError
+
+logger = logging.getLogger(__name__)
+
+PROCESSING = "processing"
+PAID = "paid"
+FAILED = "failed"
+ERROR = "error"
+
+# Namespace of the results in the callback state store
+NAMESPACE = "results"
+
+
+class PaymentResults:
+    """
+    Latest result per trackId, at most ``maxsize`` of them for ``ttl`` seconds
+
+    Each result is rendered to JSON once, when it is recorded, so serving it
+    is a cache lookup. With ``store`` (the callback state store: Redis for
+    several replicas, or the shared store under runner.py) results are also
+    published there, and a trackId recorded by another process is fetched
+    from it; final results fetched that way are kept locally.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        store: Optional[StateStore] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._results = TTLCache(maxsize, ttl, clock=clock)
+        self.ttl = ttl
+        self.store = store
+        self.recorded = 0
+        self.store_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def _unavailable(self, operation: str, error: Exception) -> None:
+        self.store_errors += 1
+        log_event(
+            logger, logging.WARNING, "results.store_unavailable",
+            operation=operation, error=str(error)
+        )
+
+    async def record(self, trackId: str, status: str, final: bool) -> None:
+        """
+        Replace ``trackId``'s result
+
+        Results are served to anyone who asks for the trackId, so they hold
+        no payment details, only the outcome.
+
+        Args:
+            status: PROCESSING, PAID, FAILED or ERROR
+            final: Whether the outcome is settled; a repeated callback
+                retries payments that are not
+        """
+        result = {
+            "trackId": trackId,
+            "status": status,
+            "final": final,
+            "updated_at": round(time.time(), 3),
+        }
+        self._results.set(trackId, _render(result))
+        self.recorded += 1
+        if self.store is not None:
+            try:
+                await self.store.set(NAMESPACE, trackId, result, self.ttl)
+            except StateStoreError as e:
+                self._unavailable("set", e)
+
+    async def get(self, trackId: str) -> Optional[CachedDocument]:
+        """The rendered result for ``trackId``, or None if it is unknown"""
+        document = self._results.get(trackId)
+        if document is not None or self.store is None:
+            return document
+        try:
+            result = await self.store.get(NAMESPACE, trackId)
+        except StateStoreError as e:
+            self._unavailable("get", e)
+            return None
+        if result is None:
+            return None
+        document = _render(result)
+        if result.get("final"):
+            self._results.set(trackId, document)
+        return document
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._results),
+            "recorded": self.recorded,
+            "store_errors": self.store_errors,
+        }
+
+
+def _render(result: dict) -> CachedDocument:
+    # Same bytes in every worker for the same result, so ETags agree
+    body = json.dumps(result, separators=(",", ":"), sort_keys=True).encode()
+    return CachedDocument(body, "application/json")
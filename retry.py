@@ -0,0 +1,105 @@
+"""
+Retry policy for upstream calls
+Exponential backoff with full jitter, bounded by a shared deadline budget
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+
+from logging_setup import log_event
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = frozenset({502, 503, 504})
+
+
+class DeadlineExceeded(Exception):
+    """The time budget ran out before an upstream call could succeed"""
+
+
+class Deadline:
+    """Time budget shared by every phase of one callback"""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left in the budget (never negative)"""
+        return max(self.expires_at - self._clock(), 0.0)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an upstream error is transient and worth another attempt"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    # Connect/read/write errors, timeouts and dropped connections
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class RetryPolicy:
+    """
+    Retry transient upstream failures within a deadline
+
+    Each attempt gets ``min(attempt_timeout, deadline.remaining())`` seconds,
+    so the total time never exceeds the deadline however slow the upstream
+    is. Between attempts the policy sleeps a random delay in
+    ``[0, min(max_delay, base_delay * 2 ** n)]`` (full jitter), and gives up
+    early when that sleep would not leave time for another attempt.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0,
+        attempt_timeout: float = 15.0
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.retries = 0
+        self.exhausted = 0
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter delay before retry number ``retry`` (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    async def run(self, fn: Callable[[float], Awaitable[T]], deadline: Deadline) -> T:
+        """Call ``fn(timeout)`` until it succeeds, fails permanently or time runs out"""
+        attempts = max(self.max_attempts, 1)
+        for attempt in range(attempts):
+            timeout = min(self.attempt_timeout, deadline.remaining())
+            if timeout <= 0:
+                self.exhausted += 1
+                raise DeadlineExceeded("Callback deadline exceeded")
+            try:
+                return await fn(timeout)
+            except Exception as e:
+                if not is_retryable(e) or attempt + 1 == attempts:
+                    raise
+                delay = self.backoff(attempt)
+                if delay >= deadline.remaining():
+                    self.exhausted += 1
+                    raise
+                self.retries += 1
+                log_event(
+                    logger, logging.WARNING, "upstream.retry",
+                    attempt=attempt + 1,
+                    error=type(e).__name__,
+                    detail=str(e),
+                    delay_s=round(delay, 3)
+                )
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        """Retry counters"""
+        return {"retries": self.retries, "deadline_exhausted": self.exhausted}
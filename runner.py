@@ -0,0 +1,94 @@
+"""
+Production runner
+Serves main:app from several uvicorn worker processes that share one
+listening socket (pre-fork), plus the shared state store the workers use to
+agree on per-trackId decisions and metrics
+
+Usage:
+    python runner.py
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+
+import uvicorn
+
+from config import settings
+from logging_setup import setup_logging
+from shared_state import serve
+
+
+def worker_count() -> int:
+    """WORKERS, or the number of CPUs this process may run on when it is 0"""
+    if settings.WORKERS > 0:
+        return settings.WORKERS
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def run_store(path: str, maxsize: int, log_level: str) -> None:
+    setup_logging(log_level)
+    serve(path, maxsize)
+
+
+def start_store(path: str, timeout: float = 10.0) -> multiprocessing.Process:
+    """Start the shared state store and wait for its socket to appear"""
+    if os.path.exists(path):
+        os.unlink(path)
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_store,
+        args=(path, settings.IDEMPOTENCY_CACHE_SIZE, settings.LOG_LEVEL),
+        name="shared-state",
+        daemon=True
+    )
+    process.start()
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if not process.is_alive() or time.monotonic() > deadline:
+            process.terminate()
+            raise RuntimeError(f"shared state store did not start on {path}")
+        time.sleep(0.05)
+    return process
+
+
+def main() -> None:
+    setup_logging(settings.LOG_LEVEL)
+    workers = worker_count()
+
+    store = None
+    if workers > 1 or settings.SHARED_STATE_PATH:
+        path = settings.SHARED_STATE_PATH or os.path.join(
+            tempfile.gettempdir(), f"payment-proxy-{os.getpid()}.sock"
+        )
+        store = start_store(path)
+        # Workers are spawned with this environment and read it into settings
+        os.environ["SHARED_STATE_PATH"] = path
+
+    try:
+        uvicorn.run(
+            "main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            workers=workers,
+            backlog=settings.BACKLOG,
+            limit_concurrency=settings.LIMIT_CONCURRENCY,
+            timeout_keep_alive=settings.KEEPALIVE_TIMEOUT,
+            timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_TIMEOUT,
+            # Client addresses (e.g. for admission control) come from
+            # X-Forwarded-For, but only when set by a trusted proxy
+            proxy_headers=True,
+            forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS,
+            # Keep the JSON logging set up by setup_logging
+            log_config=None,
+        )
+    finally:
+        if store is not None:
+            store.terminate()
+            store.join(5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Shared worker state
+A small store served over a Unix socket by the runner, so worker processes
+share per-trackId callback state (a MemoryStateStore) and report
+service-wide metrics (kept in namespaces, each a bounded TTL cache)
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+from typing import Any, Iterable, Optional
+
+from cache import TTLCache
+from logging_setup import log_event
+from metrics import Registry
+from state_store import MemoryStateStore, StateStore, StateStoreError
+
+logger = logging.getLogger(__name__)
+
+# Longest request or response line (a metrics snapshot is the largest)
+MAX_LINE = 1 << 20
+
+
+class SharedStateError(StateStoreError):
+    """The shared state store could not be reached or did not answer in time"""
+
+
+class SharedStateServer:
+    """
+    In-memory store answering newline-delimited JSON requests
+
+    Each request carries an ``id`` that is echoed in its response. Requests
+    are answered as they arrive except ``wait``, which runs on its own task
+    so it never holds up other calls on the same connection. The store runs
+    on a single event loop, so every operation is atomic: of several workers
+    calling ``begin`` for the same trackId, exactly one takes the lease.
+    """
+
+    def __init__(self, maxsize: int = 10000, default_ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.callbacks = MemoryStateStore(maxsize)
+        self._namespaces: dict[str, TTLCache] = {}
+
+    def _namespace(self, name: str) -> TTLCache:
+        cache = self._namespaces.get(name)
+        if cache is None:
+            cache = self._namespaces[name] = TTLCache(self.maxsize, self.default_ttl)
+        return cache
+
+    async def execute(self, request: dict) -> Any:
+        """Run one operation and return its result"""
+        op = request["op"]
+        if op == "begin":
+            decision, claimed = await self.callbacks.begin(
+                request["trackId"], request["owner"], request["lease_ttl"]
+            )
+            return [decision, claimed]
+        if op == "finish":
+            return await self.callbacks.finish(
+                request["trackId"], request["owner"], request["redirect_url"], request["ttl"]
+            )
+        if op == "wait":
+            return await self.callbacks.wait(request["trackId"], request["seconds"])
+
+        cache = self._namespace(request["ns"])
+        key = request.get("key")
+        if op == "get":
+            return cache.get(key)
+        if op == "set":
+            cache.set(key, request["value"], request.get("ttl"))
+            return True
+        if op == "delete":
+            return cache.pop(key) is not None
+        if op == "items":
+            return dict(cache.items())
+        raise ValueError(f"unknown operation {op!r}")
+
+    async def _respond(self, request: dict, writer: asyncio.StreamWriter) -> None:
+        try:
+            response = {"id": request["id"], "value": await self.execute(request)}
+        except Exception as e:
+            response = {"id": request.get("id"), "error": f"{type(e).__name__}: {e}"}
+        if not writer.is_closing():
+            writer.write(json.dumps(response).encode() + b"\n")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one worker connection until it closes"""
+        waiting: set[asyncio.Task] = set()
+        try:
+            while line := await reader.readline():
+                request = json.loads(line)
+                if request.get("op") == "wait":
+                    task = asyncio.create_task(self._respond(request, writer))
+                    waiting.add(task)
+                    task.add_done_callback(waiting.discard)
+                else:
+                    await self._respond(request, writer)
+                    await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            log_event(logger, logging.WARNING, "shared_state.connection_error", error=str(e))
+        finally:
+            for task in waiting:
+                task.cancel()
+            writer.close()
+
+
+async def _serve(path: str, maxsize: int) -> None:
+    if os.path.exists(path):
+        os.unlink(path)
+    store = SharedStateServer(maxsize=maxsize)
+    server = await asyncio.start_unix_server(store.handle, path=path, limit=MAX_LINE)
+    os.chmod(path, 0o600)
+    stopped = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+    try:
+        async with server:
+            await stopped.wait()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def serve(path: str, maxsize: int = 10000) -> None:
+    """Run a store on the Unix socket ``path`` until SIGTERM (started by runner.py)"""
+    # Ctrl-C reaches the whole process group; the runner stops the store
+    # itself once the workers have drained
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(path, maxsize))
+
+
+class SharedStateClient(StateStore):
+    """
+    One worker's connection to the store
+
+    Calls are pipelined over a single connection and matched to responses
+    by id. A lost connection fails the pending calls with SharedStateError
+    and is re-established by the next call.
+    """
+
+    def __init__(self, path: str, timeout: float = 1.0):
+        self.path = path
+        self.timeout = timeout
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> None:
+        """Open the connection; raises SharedStateError if the store is unreachable"""
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(self.path, limit=MAX_LINE), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            reason = str(e) or type(e).__name__
+            raise SharedStateError(f"cannot connect to {self.path}: {reason}") from e
+        self._writer = writer
+        self._reader_task = asyncio.create_task(self._read(reader), name="shared-state-reader")
+
+    async def close(self) -> None:
+        """Close the connection"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while line := await reader.readline():
+                response = json.loads(line)
+                future = self._pending.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(SharedStateError(response["error"]))
+                else:
+                    future.set_result(response["value"])
+        except (ConnectionError, ValueError) as e:
+            log_event(logger, logging.WARNING, "shared_state.connection_error", error=str(e))
+        finally:
+            self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(SharedStateError("connection to the store lost"))
+            self._pending.clear()
+
+    async def call(self, op: str, timeout: Optional[float] = None, **fields) -> Any:
+        """Send one request and return its result within ``timeout`` seconds"""
+        if not self.connected:
+            async with self._connect_lock:
+                if not self.connected:
+                    await self.connect()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write(json.dumps({"id": request_id, "op": op, **fields}).encode() + b"\n")
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise SharedStateError(f"{op} timed out") from None
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def get(self, ns: str, key: str) -> Any:
+        return await self.call("get", ns=ns, key=key)
+
+    async def set(self, ns: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.call("set", ns=ns, key=key, value=value, ttl=ttl)
+
+    async def delete(self, ns: str, key: str) -> bool:
+        return await self.call("delete", ns=ns, key=key)
+
+    async def items(self, ns: str) -> dict:
+        return await self.call("items", ns=ns)
+
+    async def begin(self, trackId: str, owner: str, lease_ttl: float) -> tuple[Optional[str], bool]:
+        decision, claimed = await self.call(
+            "begin", trackId=trackId, owner=owner, lease_ttl=lease_ttl
+        )
+        return decision, claimed
+
+    async def finish(
+        self,
+        trackId: str,
+        owner: str,
+        redirect_url: Optional[str],
+        ttl: float
+    ) -> None:
+        await self.call(
+            "finish", trackId=trackId, owner=owner, redirect_url=redirect_url, ttl=ttl
+        )
+
+    async def wait(self, trackId: str, timeout: float) -> Optional[str]:
+        return await self.call(
+            "wait", timeout=timeout + self.timeout, trackId=trackId, seconds=timeout
+        )
+
+
+class SharedMetrics:
+    """
+    Service-wide metrics for a worker pool
+
+    Each worker publishes a snapshot of its registry every ``interval``
+    seconds; a scrape on any worker merges its live samples with the other
+    workers' latest snapshots. Snapshots of a worker that stopped expire
+    after three intervals.
+    """
+
+    def __init__(self, client: SharedStateClient, registry: Registry, interval: float = 1.0):
+        self.client = client
+        self.registry = registry
+        self.interval = interval
+        self.key = str(os.getpid())
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="shared-metrics")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.client.delete("metrics", self.key)
+        except SharedStateError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.publish()
+            except SharedStateError as e:
+                log_event(
+                    logger, logging.WARNING, "shared_state.unavailable",
+                    operation="metrics", error=str(e)
+                )
+            await asyncio.sleep(self.interval)
+
+    async def publish(self) -> None:
+        """Store this worker's current snapshot"""
+        await self.client.set("metrics", self.key, self.registry.snapshot(), self.interval * 3)
+
+    async def others(self) -> Iterable[dict]:
+        """Latest snapshots of the other workers"""
+        snapshots = await self.client.items("metrics")
+        return [snapshot for key, snapshot in snapshots.items() if key != self.key]
+
+    async def render(self) -> str:
+        """Merged metrics, or this worker's alone if the store is unavailable"""
+        try:
+            others = await self.others()
+        except SharedStateError as e:
+            log_event(
+                logger, logging.WARNING, "shared_state.unavailable",
+                operation="metrics", error=str(e)
+            )
+            others = []
+        return self.registry.render(others)
@@ -0,0 +1,74 @@
+"""
+Single-flight request coalescing
+Concurrent calls for the same key share one in-flight execution
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Run at most one coroutine per key at a time
+
+    The first caller for a key starts the work; callers arriving while it is
+    in flight await the same task and receive the same result or exception.
+    The key is released as soon as the task finishes, fails or is cancelled.
+
+    A caller that is cancelled (e.g. the client disconnected) only stops
+    waiting: the shared work keeps running for the remaining callers, so a
+    payment verification is never abandoned halfway through.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> "asyncio.Future[T]":
+        """
+        The shared task running ``fn()`` for ``key``, started if none is in flight
+
+        Callers may stop waiting for it (e.g. with ``asyncio.wait`` and a
+        timeout) without cancelling it.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await ``fn()`` for ``key``, joining an in-flight call if there is one"""
+        return await asyncio.shield(self.start(key, fn))
+
+    async def drain(self, timeout: float) -> int:
+        """Wait up to ``timeout`` seconds for in-flight calls; return how many are left"""
+        tasks = list(self._inflight.values())
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        return len(self._inflight)
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """Counters of executions started and callers coalesced onto them"""
+        return {
+            "inflight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
@@ -0,0 +1,344 @@
+"""
+Callback state stores
+Per-trackId redirect decisions and processing leases, shared by every process
+that handles callbacks: in memory, or in Redis for several replicas
+"""
+
+import abc
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+from cache import TTLCache
+from logging_setup import log_event
+
+logger = logging.getLogger(__name__)
+
+
+class StateStoreError(Exception):
+    """The state store could not be reached or did not answer in time"""
+
+
+class StateStore(abc.ABC):
+    """
+    Interface of a callback state store
+
+    A process about to handle a callback calls ``begin``: it returns the
+    final redirect URL if one was already decided, and otherwise tries to
+    take the trackId's lease. Only the lease holder processes the callback,
+    then calls ``finish`` to publish a final decision (if any) and release
+    the lease. Others call ``wait``, which returns once the lease is
+    released or expires. Each of ``begin`` and ``finish`` is atomic.
+
+    ``get`` and ``set`` keep other small per-trackId values (JSON-compatible)
+    under a namespace, e.g. which payments Zibal has verified.
+    """
+
+    @abc.abstractmethod
+    async def begin(self, trackId: str, owner: str, lease_ttl: float) -> tuple[Optional[str], bool]:
+        """(decided redirect URL or None, whether ``owner`` took the lease)"""
+
+    @abc.abstractmethod
+    async def finish(
+        self,
+        trackId: str,
+        owner: str,
+        redirect_url: Optional[str],
+        ttl: float
+    ) -> None:
+        """Store ``redirect_url`` for ``ttl`` seconds (if given) and release the lease"""
+
+    @abc.abstractmethod
+    async def wait(self, trackId: str, timeout: float) -> Optional[str]:
+        """Wait up to ``timeout`` seconds for the lease to go; return the decision"""
+
+    @abc.abstractmethod
+    async def get(self, ns: str, key: str) -> Any:
+        """The value stored under ``ns``/``key``, or None"""
+
+    @abc.abstractmethod
+    async def set(self, ns: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value`` under ``ns``/``key`` for ``ttl`` seconds"""
+
+    async def close(self) -> None:
+        """Release connections"""
+
+
+class MemoryStateStore(StateStore):
+    """
+    State kept in this process, bounded to ``maxsize`` trackIds
+
+    Serves a single process directly, and the workers of runner.py through
+    the shared state store.
+    """
+
+    def __init__(self, maxsize: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._decisions = TTLCache(maxsize, ttl=3600.0, clock=clock)
+        self._leases = TTLCache(maxsize, ttl=60.0, clock=clock)
+        self._released: dict[str, asyncio.Event] = {}
+        self._values: dict[str, TTLCache] = {}
+
+    async def begin(self, trackId: str, owner: str, lease_ttl: float) -> tuple[Optional[str], bool]:
+        decision = self._decisions.get(trackId)
+        if decision is not None:
+            return decision, False
+        if self._leases.get(trackId) is not None:
+            return None, False
+        self._leases.set(trackId, owner, lease_ttl)
+        return None, True
+
+    async def finish(
+        self,
+        trackId: str,
+        owner: str,
+        redirect_url: Optional[str],
+        ttl: float
+    ) -> None:
+        if redirect_url is not None:
+            self._decisions.set(trackId, redirect_url, ttl)
+        if self._leases.get(trackId) == owner:
+            self._leases.pop(trackId)
+            released = self._released.pop(trackId, None)
+            if released is not None:
+                released.set()
+
+    async def wait(self, trackId: str, timeout: float) -> Optional[str]:
+        if self._leases.get(trackId) is not None:
+            released = self._released.setdefault(trackId, asyncio.Event())
+            try:
+                await asyncio.wait_for(released.wait(), timeout)
+            except asyncio.TimeoutError:
+                # Expired leases do not signal; forget the event once the lease is gone
+                if self._leases.get(trackId) is None:
+                    self._released.pop(trackId, None)
+        return self._decisions.get(trackId)
+
+    async def get(self, ns: str, key: str) -> Any:
+        values = self._values.get(ns)
+        return None if values is None else values.get(key)
+
+    async def set(self, ns: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        values = self._values.get(ns)
+        if values is None:
+            values = self._values[ns] = TTLCache(self.maxsize, ttl=3600.0, clock=self.clock)
+        values.set(key, value, ttl)
+
+
+# KEYS: decision, lease. ARGV: owner, lease TTL in ms.
+# Returns {1, url} if decided, {2} if this call took the lease, {0} if held.
+BEGIN_SCRIPT = """
+local decision = redis.call('GET', KEYS[1])
+if decision then
+    return {1, decision}
+end
+if redis.call('SET', KEYS[2], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return {2}
+end
+return {0}
+"""
+
+# KEYS: decision, lease. ARGV: owner, redirect URL ('' if not final), TTL in ms.
+FINISH_SCRIPT = """
+if ARGV[2] ~= '' then
+    redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+end
+if redis.call('GET', KEYS[2]) == ARGV[1] then
+    return redis.call('DEL', KEYS[2])
+end
+return 0
+"""
+
+
+class RedisStateStore(StateStore):
+    """
+    State in Redis (or anything speaking its protocol), shared by replicas
+
+    ``begin`` and ``finish`` are Lua scripts, so each is one atomic round
+    trip (sent with EVALSHA once the script is cached). ``wait`` polls the
+    decision and the lease in one pipelined round trip every
+    ``poll_interval`` seconds. Other values are stored as JSON under
+    ``{key_prefix}{ns}:{key}``. Connections come from a blocking pool of
+    ``max_connections``; pass ``client`` to use an existing client instead,
+    e.g. fakeredis.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        max_connections: int = 50,
+        key_prefix: str = "payment-proxy:",
+        timeout: float = 1.0,
+        poll_interval: float = 0.05,
+        client=None
+    ):
+        # Imported here: only STATE_STORE=redis pays for the redis package
+        from redis.exceptions import RedisError
+
+        if client is None:
+            import redis.asyncio as aioredis
+
+            pool = aioredis.BlockingConnectionPool.from_url(
+                url,
+                max_connections=max_connections,
+                timeout=timeout,
+                socket_timeout=timeout,
+                socket_connect_timeout=timeout,
+                decode_responses=True
+            )
+            client = aioredis.Redis(connection_pool=pool)
+        self.client = client
+        self._errors = (RedisError, OSError, asyncio.TimeoutError)
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._begin = client.register_script(BEGIN_SCRIPT)
+        self._finish = client.register_script(FINISH_SCRIPT)
+
+    def _keys(self, trackId: str) -> list[str]:
+        return [f"{self.key_prefix}decision:{trackId}", f"{self.key_prefix}lease:{trackId}"]
+
+    async def _call(self, operation):
+        try:
+            return await asyncio.wait_for(operation, self.timeout)
+        except self._errors as e:
+            raise StateStoreError(str(e) or type(e).__name__) from e
+
+    async def begin(self, trackId: str, owner: str, lease_ttl: float) -> tuple[Optional[str], bool]:
+        result = await self._call(
+            self._begin(keys=self._keys(trackId), args=[owner, int(lease_ttl * 1000)])
+        )
+        if result[0] == 1:
+            return _text(result[1]), False
+        return None, result[0] == 2
+
+    async def finish(
+        self,
+        trackId: str,
+        owner: str,
+        redirect_url: Optional[str],
+        ttl: float
+    ) -> None:
+        await self._call(
+            self._finish(
+                keys=self._keys(trackId),
+                args=[owner, redirect_url or "", int(ttl * 1000)]
+            )
+        )
+
+    async def _poll(self, trackId: str) -> tuple[Optional[str], bool]:
+        decision_key, lease_key = self._keys(trackId)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(decision_key)
+            pipe.exists(lease_key)
+            decision, leased = await pipe.execute()
+        return _text(decision), bool(leased)
+
+    async def wait(self, trackId: str, timeout: float) -> Optional[str]:
+        deadline = time.monotonic() + timeout
+        while True:
+            decision, leased = await self._call(self._poll(trackId))
+            if decision is not None or not leased or time.monotonic() >= deadline:
+                return decision
+            await asyncio.sleep(self.poll_interval)
+
+    async def get(self, ns: str, key: str) -> Any:
+        value = await self._call(self.client.get(f"{self.key_prefix}{ns}:{key}"))
+        return None if value is None else json.loads(value)
+
+    async def set(self, ns: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self._call(
+            self.client.set(
+                f"{self.key_prefix}{ns}:{key}",
+                json.dumps(value, separators=(",", ":")),
+                px=None if ttl is None else int(ttl * 1000)
+            )
+        )
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def _text(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class CallbackStates:
+    """
+    A process's view of the callback state store
+
+    Fills in this process's lease owner id and the TTLs, and degrades store
+    errors to per-process behaviour: when the store fails, this process
+    handles the callback itself.
+    """
+
+    def __init__(self, store: StateStore, ttl: float, lease_ttl: float):
+        self.store = store
+        self.ttl = ttl
+        self.lease_ttl = lease_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.errors = 0
+
+    def _unavailable(self, operation: str, error: Exception) -> None:
+        self.errors += 1
+        log_event(
+            logger, logging.WARNING, "state_store.unavailable",
+            operation=operation, error=str(error)
+        )
+
+    async def begin(self, trackId: str) -> tuple[Optional[str], bool]:
+        """
+        (decided redirect URL or None, whether this process should handle it)
+
+        Waits out other processes' leases: a lease released or expired
+        without a final decision is taken over, so this returns once there
+        is a decision or this process holds the lease.
+        """
+        while True:
+            operation = "begin"
+            try:
+                redirect_url, claimed = await self.store.begin(trackId, self.owner, self.lease_ttl)
+                if redirect_url is not None or claimed:
+                    return redirect_url, claimed
+                operation = "wait"
+                redirect_url = await self.store.wait(trackId, self.lease_ttl)
+            except StateStoreError as e:
+                self._unavailable(operation, e)
+                return None, True
+            if redirect_url is not None:
+                return redirect_url, False
+
+    async def finish(self, trackId: str, redirect_url: Optional[str]) -> None:
+        """Publish a final redirect URL (None if not final) and release the lease"""
+        try:
+            await self.store.finish(trackId, self.owner, redirect_url, self.ttl)
+        except StateStoreError as e:
+            self._unavailable("finish", e)
+
+    async def get(self, ns: str, key: str) -> Any:
+        """The value under ``ns``/``key``, or None if unknown or the store failed"""
+        try:
+            return await self.store.get(ns, key)
+        except StateStoreError as e:
+            self._unavailable("get", e)
+            return None
+
+    async def set(self, ns: str, key: str, value: Any) -> None:
+        """Store ``value`` under ``ns``/``key`` for the decision TTL"""
+        try:
+            await self.store.set(ns, key, value, self.ttl)
+        except StateStoreError as e:
+            self._unavailable("set", e)
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.store).__name__,
+            "owner": self.owner,
+            "errors": self.errors,
+        }
@@ -0,0 +1,94 @@
+"""
+Test setup
+Required settings and the repository root on the import path, before any
+module reads config.settings, plus the app and upstream fixtures
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+os.environ.setdefault("TICKETING_API_URL", "http://ticketing.test/api")
+os.environ.setdefault("TICKETING_FRONTEND_URL", "http://frontend.test")
+os.environ.setdefault("WEBHOOK_SECRET", "test-secret")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CALLBACK_OUTBOX_PATH", "")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+import http_clients  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class Upstreams:
+    """Zibal and ticketing API stand-ins recording the calls they get"""
+
+    def __init__(self, verify_delay: float = 0.05):
+        self.verify_delay = verify_delay
+        self.verified: list[int] = []
+        self.webhooks: list[dict] = []
+        # Responses to hand out first, before the default successful ones
+        self.verify_responses: list[dict] = []
+        self.webhook_responses: list[dict] = []
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST":
+            # Readiness probes
+            return httpx.Response(200)
+        body = json.loads(request.content)
+        if "verify" in request.url.path:
+            self.verified.append(body["trackId"])
+            await asyncio.sleep(self.verify_delay)
+            if self.verify_responses:
+                return httpx.Response(200, json=self.verify_responses.pop(0))
+            return httpx.Response(200, json={"result": 100, "message": "success"})
+        self.webhooks.append(body)
+        if self.webhook_responses:
+            return httpx.Response(200, json=self.webhook_responses.pop(0))
+        return httpx.Response(
+            200, json={"success": True, "ref_number": "R1", "reservation_id": 7}
+        )
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    upstreams = Upstreams()
+    monkeypatch.setattr(
+        http_clients, "create_http_client",
+        lambda http2=False: httpx.AsyncClient(transport=httpx.MockTransport(upstreams.handle))
+    )
+    return upstreams
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """main.app with fresh per-process state, so tests do not see each other's trackIds"""
+    import main
+    from admission import AdmissionController
+    from cache import TTLCache
+    from results import PaymentResults
+    from singleflight import SingleFlight
+
+    monkeypatch.setattr(main, "callback_cache", TTLCache(maxsize=1000, ttl=3600))
+    monkeypatch.setattr(main, "verified_payments", TTLCache(maxsize=1000, ttl=3600))
+    monkeypatch.setattr(main, "payment_results", PaymentResults(maxsize=1000, ttl=3600))
+    monkeypatch.setattr(main, "callback_flights", SingleFlight())
+    monkeypatch.setattr(main, "admission", AdmissionController())
+    return main.app
+
+
+@pytest.fixture
+async def client(app, upstreams):
+    """HTTP client for the app, run through its lifespan against the mocked upstreams"""
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy.test") as client:
+            yield client
@@ -0,0 +1,39 @@
+"""CircuitBreaker: only upstream failures count towards opening the circuit"""
+
+import asyncio
+
+import pytest
+
+from breaker import OPEN, CircuitBreaker, CircuitOpenError
+
+pytestmark = pytest.mark.anyio
+
+
+def make_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        "upstream", window_size=4, min_calls=4, failure_rate=0.5,
+        failure_types=(ConnectionError, asyncio.TimeoutError)
+    )
+
+
+async def raise_(error: BaseException):
+    raise error
+
+
+async def test_failure_types_open_the_circuit():
+    breaker = make_breaker()
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            await breaker.call(lambda: raise_(ConnectionError("refused")))
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(lambda: raise_(AssertionError("not called")))
+
+
+async def test_other_exceptions_are_not_recorded():
+    breaker = make_breaker()
+    for _ in range(25):
+        with pytest.raises(ValueError):
+            await breaker.call(lambda: raise_(ValueError("invalid literal for int()")))
+    assert breaker.state != OPEN
+    assert breaker.stats()["window_calls"] == 0
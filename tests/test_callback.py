@@ -0,0 +1,218 @@
+"""Zibal callback endpoint against mocked upstreams"""
+
+import asyncio
+
+import pytest
+
+import main
+from admission import AdmissionController, TokenBucketLimiter
+from breaker import CircuitOpenError
+from cache import TTLCache
+from results import PaymentResults
+from state_store import CallbackStates, MemoryStateStore
+
+pytestmark = pytest.mark.anyio
+
+
+def callback(client, trackId: str):
+    return client.get(
+        "/api/zibal/callback", params={"trackId": trackId, "success": 1, "status": 2}
+    )
+
+
+async def test_parallel_callbacks_for_one_track_id_verify_once(client, upstreams):
+    responses = await asyncio.gather(*(callback(client, "4001") for _ in range(10)))
+
+    assert upstreams.verified == [4001]
+    assert len(upstreams.webhooks) == 1
+    assert {response.status_code for response in responses} == {303}
+    assert {response.headers["location"] for response in responses} == {
+        "http://frontend.test/payment/success?ref_id=R1&reservation_id=7"
+    }
+
+
+async def test_non_numeric_track_ids_are_rejected_before_any_upstream_call(client, upstreams):
+    responses = await asyncio.gather(*(callback(client, "abc") for _ in range(25)))
+
+    assert {response.status_code for response in responses} == {422}
+    assert upstreams.verified == []
+    assert main.app.state.breakers["zibal"].stats()["window_calls"] == 0
+
+
+async def test_repeated_callbacks_skip_admission_control(client, upstreams, monkeypatch):
+    monkeypatch.setattr(
+        main, "admission",
+        AdmissionController(limiter=TokenBucketLimiter(rate=0.001, burst=1))
+    )
+
+    first = await callback(client, "4002")
+    repeats = [await callback(client, "4002") for _ in range(5)]
+    other = await callback(client, "4003")
+
+    assert first.status_code == 303
+    assert {r.headers["location"] for r in repeats} == {first.headers["location"]}
+    # The one token went to the first callback; a new trackId is shed
+    assert other.status_code == 503
+    assert upstreams.verified == [4002]
+
+
+async def test_replay_after_rejected_webhook_counts_already_verified_as_paid(client, upstreams):
+    # The first run is verified but the ticketing API rejects it; the replay's
+    # verify gets 201 ("already verified") and its webhook succeeds
+    upstreams.verify_responses = [
+        {"result": 100, "message": "success"},
+        {"result": 201, "message": "already verified"},
+    ]
+    upstreams.webhook_responses = [{"success": False}]
+
+    first = await callback(client, "4004")
+    replay = await callback(client, "4004")
+    status = await client.get("/api/payments/4004/status")
+
+    assert "/payment/failed" in first.headers["location"]
+    assert replay.headers["location"] == (
+        "http://frontend.test/payment/success?ref_id=R1&reservation_id=7"
+    )
+    assert upstreams.verified == [4004, 4004]
+    body = status.json()
+    assert (body["status"], body["final"]) == ("paid", True)
+    # Public endpoint: the outcome only, no reservation or redirect
+    assert set(body) == {"trackId", "status", "final", "updated_at"}
+
+
+async def test_replay_on_another_replica_finds_the_verified_mark_in_the_store(
+    client, upstreams, monkeypatch
+):
+    main.app.state.callback_states = CallbackStates(MemoryStateStore(), ttl=3600, lease_ttl=30)
+    upstreams.verify_responses = [
+        {"result": 100, "message": "success"},
+        {"result": 201, "message": "already verified"},
+    ]
+    upstreams.webhook_responses = [{"success": False}]
+
+    await callback(client, "4006")
+    # The replay lands on a replica with none of this one's local caches
+    monkeypatch.setattr(main, "callback_cache", TTLCache(maxsize=1000, ttl=3600))
+    monkeypatch.setattr(main, "verified_payments", TTLCache(maxsize=1000, ttl=3600))
+    replay = await callback(client, "4006")
+
+    assert "/payment/success" in replay.headers["location"]
+
+
+async def test_already_verified_without_a_mark_is_not_final(client, upstreams):
+    upstreams.verify_responses = [
+        {"result": 201, "message": "already verified"},
+        {"result": 100, "message": "success"},
+    ]
+
+    first = await callback(client, "4007")
+    status = await client.get("/api/payments/4007/status")
+    retry = await callback(client, "4007")
+
+    assert "/payment/failed" in first.headers["location"]
+    assert (status.json()["status"], status.json()["final"]) == ("failed", False)
+    assert "/payment/success" in retry.headers["location"]
+    assert upstreams.verified == [4007, 4007]
+
+
+async def test_status_is_served_with_etag_and_without_upstream_calls(client, upstreams):
+    assert (await client.get("/api/payments/4005/status")).status_code == 404
+    await callback(client, "4005")
+    status = await client.get("/api/payments/4005/status")
+
+    polls = [
+        await client.get(
+            "/api/payments/4005/status", headers={"If-None-Match": status.headers["etag"]}
+        )
+        for _ in range(20)
+    ]
+
+    assert {response.status_code for response in polls} == {304}
+    assert upstreams.verified == [4005]
+
+
+async def test_status_is_answered_by_replicas_sharing_the_state_store(
+    client, upstreams, monkeypatch
+):
+    store = MemoryStateStore()
+    main.payment_results.store = store
+    await callback(client, "4008")
+
+    # Another replica: its own result cache, the same store
+    monkeypatch.setattr(main, "payment_results", PaymentResults(1000, 3600, store=store))
+    status = await client.get("/api/payments/4008/status")
+
+    assert status.status_code == 200
+    assert (status.json()["status"], status.json()["final"]) == ("paid", True)
+
+
+@pytest.fixture
+def callback_outbox(monkeypatch, tmp_path):
+    """A callback outbox that polls fast; request it before ``client``"""
+    monkeypatch.setattr(main.settings, "CALLBACK_OUTBOX_PATH", str(tmp_path / "callbacks.db"))
+    monkeypatch.setattr(main.settings, "OUTBOX_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(main.settings, "WEBHOOK_RETRY_DELAY", 0.01)
+
+
+async def test_open_zibal_circuit_holds_the_callback_and_redirects_to_pending(
+    callback_outbox, client, upstreams, monkeypatch
+):
+    breaker = main.app.state.breakers["zibal"]
+    closed_call = breaker.call
+    circuit_open = True
+
+    async def call(fn):
+        if circuit_open:
+            raise CircuitOpenError("zibal", 0.01)
+        return await closed_call(fn)
+
+    monkeypatch.setattr(breaker, "call", call)
+
+    response = await callback(client, "4009")
+    status = await client.get("/api/payments/4009/status")
+
+    assert response.headers["location"] == (
+        "http://frontend.test/payment/pending?trackId=4009&success=1&status=2"
+    )
+    assert status.json()["status"] == "processing"
+    assert upstreams.verified == []
+
+    circuit_open = False
+    for _ in range(200):
+        if main.app.state.callback_outbox.stats()["delivered"]:
+            break
+        await asyncio.sleep(0.01)
+
+    status = await client.get("/api/payments/4009/status")
+    assert (status.json()["status"], status.json()["final"]) == ("paid", True)
+    assert upstreams.verified == [4009]
+    assert len(upstreams.webhooks) == 1
+
+
+async def test_slow_verify_redirects_to_pending_and_a_later_callback_gets_the_result(
+    client, upstreams, monkeypatch
+):
+    monkeypatch.setattr(main.settings, "CALLBACK_PENDING_AFTER", 0.01)
+    upstreams.verify_delay = 0.2
+
+    response = await callback(client, "4010")
+    status = await client.get("/api/payments/4010/status")
+
+    assert response.headers["location"] == (
+        "http://frontend.test/payment/pending?trackId=4010&success=1&status=2"
+    )
+    assert (status.json()["status"], status.json()["final"]) == ("processing", False)
+
+    # The run finishes in the background; a callback sent meanwhile joins it
+    later = await callback(client, "4010")
+    assert "/payment/pending" in later.headers["location"]
+    await main.callback_flights.drain(5)
+
+    final = await callback(client, "4010")
+    status = await client.get("/api/payments/4010/status")
+
+    assert final.headers["location"] == (
+        "http://frontend.test/payment/success?ref_id=R1&reservation_id=7"
+    )
+    assert (status.json()["status"], status.json()["final"]) == ("paid", True)
+    assert upstreams.verified == [4010]
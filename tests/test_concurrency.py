@@ -0,0 +1,100 @@
+"""ConcurrencyLimiter: bounded slots, FIFO queueing and shedding"""
+
+import asyncio
+
+import pytest
+
+from concurrency import QUEUE_FULL, QUEUE_TIMEOUT, ConcurrencyLimiter, UpstreamBusyError
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_waiters_get_released_slots_in_fifo_order():
+    limiter = ConcurrencyLimiter("upstream", max_concurrent=1, max_queue=10)
+    order: list[int] = []
+    await limiter.acquire()
+
+    async def wait_turn(n: int):
+        async with limiter.slot():
+            order.append(n)
+
+    waiters = [asyncio.create_task(wait_turn(n)) for n in range(3)]
+    await asyncio.sleep(0)
+    assert (limiter.active, limiter.queued) == (1, 3)
+
+    limiter.release()
+    await asyncio.gather(*waiters)
+
+    assert order == [0, 1, 2]
+    assert (limiter.active, limiter.queued) == (0, 0)
+
+
+async def test_callers_beyond_the_queue_are_shed_at_once():
+    limiter = ConcurrencyLimiter("upstream", max_concurrent=1, max_queue=1)
+    await limiter.acquire()
+    queued = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(UpstreamBusyError) as shed:
+        await limiter.acquire()
+
+    assert shed.value.reason == QUEUE_FULL
+    limiter.release()
+    await queued
+    assert limiter.stats()["shed"] == {QUEUE_FULL: 1, QUEUE_TIMEOUT: 0}
+
+
+async def test_waiting_longer_than_the_timeout_is_shed():
+    limiter = ConcurrencyLimiter("upstream", max_concurrent=1, queue_timeout=5)
+    await limiter.acquire()
+
+    with pytest.raises(UpstreamBusyError) as shed:
+        await limiter.acquire(timeout=0.01)
+
+    assert shed.value.reason == QUEUE_TIMEOUT
+    assert limiter.queued == 0
+    # The slot goes back to the pool, not to the caller that gave up
+    limiter.release()
+    assert limiter.active == 0
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    limiter = ConcurrencyLimiter("upstream", max_concurrent=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert limiter.queued == 0
+    limiter.release()
+    assert limiter.active == 0
+
+
+async def test_slot_handed_to_a_waiter_cancelled_before_it_ran_is_not_lost():
+    limiter = ConcurrencyLimiter("upstream", max_concurrent=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    # The slot is handed over, but the waiter is cancelled before it resumes:
+    # depending on the Python version it either keeps the slot or gives it back
+    limiter.release()
+    waiter.cancel()
+    try:
+        await waiter
+        limiter.release()
+    except asyncio.CancelledError:
+        pass
+
+    assert (limiter.active, limiter.queued) == (0, 0)
+    assert await limiter.acquire() == 0.0
+
+
+async def test_zero_means_no_limit():
+    limiter = ConcurrencyLimiter("upstream", max_concurrent=0)
+    for _ in range(100):
+        await limiter.acquire()
+    assert limiter.active == 100
@@ -0,0 +1,21 @@
+"""Cold start: main imports within the startup budget, docs and redis lazily"""
+
+import os
+import statistics
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+from bench_import import import_times  # noqa: E402
+
+BUDGET_MS = 1500.0
+
+
+def test_main_imports_within_the_budget():
+    runs = [import_times("main") for _ in range(3)]
+    median_ms = statistics.median(run["main"][1] / 1000 for run in runs)
+
+    assert median_ms < BUDGET_MS
+    for name in ("scalar_fastapi", "redis"):
+        assert name not in runs[-1], f"{name} is imported at startup"
@@ -0,0 +1,88 @@
+"""WebhookOutbox: workers sharing one outbox file deliver each row once"""
+
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from breaker import CircuitOpenError
+from outbox import WebhookOutbox
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_dispatchers_sharing_a_file_deliver_each_row_once(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    delivered: list[str] = []
+
+    async def deliver(webhook_data: dict) -> dict:
+        await asyncio.sleep(0.001)
+        delivered.append(webhook_data["trackId"])
+        return {"success": True}
+
+    writer = WebhookOutbox(path, deliver)
+    await writer.start(dispatch=False)
+    await asyncio.gather(*(writer.add({"trackId": str(i)}) for i in range(200)))
+    await writer.stop()
+
+    workers = [
+        WebhookOutbox(path, deliver, batch_size=16, poll_interval=0.01)
+        for _ in range(3)
+    ]
+    for worker in workers:
+        await worker.start()
+    for _ in range(500):
+        if len(delivered) >= 200:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    for worker in workers:
+        await worker.stop()
+
+    assert sorted(delivered, key=int) == [str(i) for i in range(200)]
+    assert sum(worker.delivered for worker in workers) == 200
+    with sqlite3.connect(path) as conn:
+        assert conn.execute(
+            "SELECT COUNT(*) FROM webhook_outbox WHERE status = 'delivered'"
+        ).fetchone()[0] == 200
+
+
+async def test_stop_hands_claimed_rows_back(tmp_path):
+    path = str(tmp_path / "outbox.db")
+
+    async def hang(webhook_data: dict) -> dict:
+        await asyncio.Event().wait()
+
+    outbox = WebhookOutbox(path, hang, poll_interval=0.01)
+    await outbox.start()
+    await outbox.add({"trackId": "1"})
+    await asyncio.sleep(0.05)
+    await outbox.stop()
+
+    with sqlite3.connect(path) as conn:
+        assert conn.execute(
+            "SELECT status, owner FROM webhook_outbox"
+        ).fetchall() == [("pending", None)]
+
+
+async def test_open_circuit_reschedules_without_using_an_attempt(tmp_path):
+    path = str(tmp_path / "outbox.db")
+
+    async def circuit_open(webhook_data: dict) -> dict:
+        raise CircuitOpenError("ticketing", 30.0)
+
+    outbox = WebhookOutbox(path, circuit_open, max_attempts=1, poll_interval=0.01)
+    await outbox.start()
+    await outbox.add({"trackId": "1"})
+    await asyncio.sleep(0.05)
+    await outbox.stop()
+
+    assert outbox.deferred == 1
+    assert outbox.failed == 0
+    with sqlite3.connect(path) as conn:
+        status, attempts, next_attempt_at = conn.execute(
+            "SELECT status, attempts, next_attempt_at FROM webhook_outbox"
+        ).fetchone()
+    assert (status, attempts) == ("pending", 0)
+    assert next_attempt_at > time.time() + 20
@@ -0,0 +1,97 @@
+"""RetryPolicy: jittered backoff within a shared deadline"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from retry import Deadline, DeadlineExceeded, RetryPolicy, is_retryable
+
+pytestmark = pytest.mark.anyio
+
+
+def status_error(code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://upstream.test/")
+    return httpx.HTTPStatusError(
+        "upstream error", request=request, response=httpx.Response(code, request=request)
+    )
+
+
+def test_backoff_stays_within_the_full_jitter_bounds():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.5)
+    for retry, ceiling in [(0, 0.1), (1, 0.2), (2, 0.4), (3, 0.5), (10, 0.5)]:
+        delays = [policy.backoff(retry) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        # Full jitter spreads retries over the whole range
+        assert max(delays) - min(delays) > ceiling / 2
+
+
+def test_only_transient_errors_are_retryable():
+    assert is_retryable(httpx.ConnectError("refused"))
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(status_error(503))
+    assert not is_retryable(status_error(400))
+    assert not is_retryable(ValueError("bad payload"))
+
+
+async def test_transient_failures_are_retried_until_success():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001)
+    results = [httpx.ConnectError("refused"), status_error(502), "ok"]
+
+    async def call(timeout: float) -> str:
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert await policy.run(call, Deadline(5)) == "ok"
+    assert policy.stats() == {"retries": 2, "deadline_exhausted": 0}
+
+
+async def test_permanent_failures_are_not_retried():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+    calls = 0
+
+    async def call(timeout: float):
+        nonlocal calls
+        calls += 1
+        raise status_error(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await policy.run(call, Deadline(5))
+    assert calls == 1
+
+
+async def test_attempts_share_the_deadline():
+    policy = RetryPolicy(max_attempts=10, base_delay=0.001, max_delay=0.001, attempt_timeout=5)
+    timeouts: list[float] = []
+
+    async def call(timeout: float):
+        timeouts.append(timeout)
+        await asyncio.sleep(0.03)
+        raise httpx.ReadTimeout("slow")
+
+    with pytest.raises((httpx.ReadTimeout, DeadlineExceeded)):
+        await policy.run(call, Deadline(0.1))
+    # Each attempt is capped by what is left of the budget, so the deadline
+    # cuts the retries short of max_attempts
+    assert timeouts[0] <= 0.1
+    assert all(later < earlier for earlier, later in zip(timeouts, timeouts[1:]))
+    assert len(timeouts) < 10
+    assert policy.exhausted == 1
+
+
+async def test_no_retry_when_the_backoff_would_outlast_the_deadline():
+    policy = RetryPolicy(max_attempts=5, base_delay=10, max_delay=10)
+    policy.backoff = lambda retry: 10.0
+    calls = 0
+
+    async def call(timeout: float):
+        nonlocal calls
+        calls += 1
+        raise httpx.ConnectError("refused")
+
+    with pytest.raises(httpx.ConnectError):
+        await policy.run(call, Deadline(1))
+    assert calls == 1
+    assert policy.stats() == {"retries": 0, "deadline_exhausted": 1}
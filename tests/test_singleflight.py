@@ -0,0 +1,89 @@
+"""SingleFlight: one execution per key, released on success, error and cancellation"""
+
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    runs = 0
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(flights.do("key", work) for _ in range(10)))
+    assert results == ["result"] * 10
+    assert runs == 1
+    assert flights.stats() == {"inflight": 0, "leaders": 1, "followers": 9}
+
+
+async def test_error_reaches_every_caller_and_releases_the_key():
+    flights = SingleFlight()
+    runs = 0
+
+    async def failing():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream said no")
+
+    results = await asyncio.gather(
+        *(flights.do("key", failing) for _ in range(3)), return_exceptions=True
+    )
+    assert runs == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(flights) == 0
+
+    async def succeeding():
+        return "retried"
+
+    assert await flights.do("key", succeeding) == "retried"
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_work():
+    flights = SingleFlight()
+    finished = asyncio.Event()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        finished.set()
+        return "done"
+
+    leader = asyncio.ensure_future(flights.do("key", work))
+    follower = asyncio.ensure_future(flights.do("key", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+    assert await follower == "done"
+    assert finished.is_set()
+    assert len(flights) == 0
+
+
+async def test_cancelled_work_releases_the_key():
+    flights = SingleFlight()
+
+    async def hang():
+        await asyncio.Event().wait()
+
+    task = flights.start("key", hang)
+    waiter = asyncio.ensure_future(flights.do("key", hang))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert len(flights) == 0
+
+    async def quick():
+        return "fresh"
+
+    assert await flights.do("key", quick) == "fresh"
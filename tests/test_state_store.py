@@ -0,0 +1,123 @@
+"""Callback state stores: Lua scripts, waiting for leases, taking over"""
+
+import asyncio
+
+import pytest
+
+from state_store import CallbackStates, MemoryStateStore, RedisStateStore, StateStore
+
+pytestmark = pytest.mark.anyio
+
+URL = "https://frontend.test/payment/success?trackId=1"
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request) -> StateStore:
+    if request.param == "memory":
+        return MemoryStateStore()
+    return RedisStateStore(client=fake_redis(), poll_interval=0.005)
+
+
+def fake_redis():
+    # Lua scripts on fakeredis need lupa
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+
+async def test_begin_claims_once_and_returns_the_decision(store):
+    assert await store.begin("1", "a", 30) == (None, True)
+    assert await store.begin("1", "b", 30) == (None, False)
+
+    await store.finish("1", "a", URL, 60)
+
+    assert await store.begin("1", "b", 30) == (URL, False)
+
+
+async def test_finish_by_another_owner_keeps_the_lease(store):
+    await store.begin("1", "a", 30)
+
+    await store.finish("1", "b", None, 60)
+
+    assert await store.begin("1", "c", 30) == (None, False)
+
+
+async def test_finish_without_a_decision_frees_the_trackId(store):
+    await store.begin("1", "a", 30)
+
+    await store.finish("1", "a", None, 60)
+
+    assert await store.begin("1", "b", 30) == (None, True)
+
+
+async def test_wait_returns_the_decision_when_the_lease_is_released(store):
+    await store.begin("1", "a", 30)
+
+    async def finish_later():
+        await asyncio.sleep(0.02)
+        await store.finish("1", "a", URL, 60)
+
+    finisher = asyncio.create_task(finish_later())
+    assert await store.wait("1", 5) == URL
+    await finisher
+
+
+async def test_wait_gives_up_after_the_timeout(store):
+    await store.begin("1", "a", 30)
+
+    assert await store.wait("1", 0.02) is None
+
+
+async def test_values_are_kept_per_namespace(store):
+    await store.set("verified", "1", True, 60)
+
+    assert await store.get("verified", "1") is True
+    assert await store.get("verified", "2") is None
+    assert await store.get("results", "1") is None
+
+
+async def test_redis_scripts_set_ttls():
+    client = fake_redis()
+    store = RedisStateStore(client=client, key_prefix="test:")
+
+    await store.begin("1", "a", 30)
+    assert await client.get("test:lease:1") == "a"
+    assert 0 < await client.pttl("test:lease:1") <= 30000
+
+    await store.finish("1", "a", URL, 60)
+    assert await client.exists("test:lease:1") == 0
+    assert 30000 < await client.pttl("test:decision:1") <= 60000
+
+
+async def test_waiting_process_takes_over_a_lease_left_without_decision(store):
+    first = CallbackStates(store, ttl=60, lease_ttl=5)
+    second = CallbackStates(store, ttl=60, lease_ttl=5)
+    assert await first.begin("1") == (None, True)
+
+    waiting = asyncio.create_task(second.begin("1"))
+    await asyncio.sleep(0.02)
+    assert not waiting.done()
+    await first.finish("1", None)
+
+    assert await asyncio.wait_for(waiting, 5) == (None, True)
+    assert await store.begin("1", "c", 30) == (None, False)
+    assert second.errors == 0
+
+
+async def test_waiting_process_takes_over_an_expired_lease(store):
+    crashed = CallbackStates(store, ttl=60, lease_ttl=0.05)
+    second = CallbackStates(store, ttl=60, lease_ttl=0.05)
+    assert await crashed.begin("1") == (None, True)
+
+    assert await asyncio.wait_for(second.begin("1"), 5) == (None, True)
+    await second.finish("1", URL)
+    assert await crashed.begin("1") == (URL, False)
+
+
+async def test_state_store_requires_the_whole_interface():
+    class Partial(StateStore):
+        async def begin(self, trackId, owner, lease_ttl):
+            return None, True
+
+    with pytest.raises(TypeError):
+        Partial()
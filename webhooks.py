@@ -0,0 +1,156 @@
+"""
+Ticketing API webhook
+Builds, signs and sends verified payment results to the ticketing API
+"""
+
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+import httpx
+from config import settings
+from signing import WebhookSigner, parse_keys
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used instead
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Primary key first; extra keys are only set while rotating the secret
+signer = WebhookSigner(
+    [(settings.WEBHOOK_KEY_ID, settings.WEBHOOK_SECRET)]
+    + parse_keys(settings.WEBHOOK_EXTRA_KEYS)
+)
+
+
+def signature_message(data: dict) -> bytes:
+    """The part of a webhook payload covered by its signature"""
+    return f"{data['trackId']}:{data['success']}:{data['status']}".encode()
+
+
+def create_signature(data: dict) -> str:
+    """Create HMAC signature for webhook security"""
+    return signer.sign(signature_message(data))
+
+
+def create_body_signature(body: bytes) -> str:
+    """Create HMAC signature over a raw request body"""
+    return signer.sign(body)
+
+
+def encode_json(data) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def timestamped_signature_headers(body: bytes) -> dict:
+    """
+    v2 signature headers: HMAC over ``b"{timestamp}." + body``
+
+    The signature covers the exact bytes sent, and the timestamp lets the
+    receiver reject replayed requests.
+    """
+    timestamp = str(int(time.time()))
+    headers = signer.headers(timestamp.encode() + b"." + body)
+    headers["X-Webhook-Timestamp"] = timestamp
+    headers["X-Webhook-Signature-Version"] = "v2"
+    return headers
+
+
+def build_webhook_data(
+    trackId: str,
+    success: int,
+    status: int,
+    orderId: Optional[str],
+    verify_result: dict
+) -> dict:
+    """Prepare the webhook payload for a verified payment"""
+    return {
+        "trackId": trackId,
+        "success": success,
+        "status": status,
+        "orderId": orderId,
+        "verifyResult": verify_result,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+async def send_webhook(
+    client: httpx.AsyncClient,
+    webhook_data: dict,
+    timeout: Optional[float] = None
+) -> dict:
+    """
+    POST a signed webhook to the ticketing API
+
+    Returns:
+        dict: JSON body returned by the ticketing API
+
+    Raises:
+        httpx.RequestError: The ticketing API could not be reached
+        httpx.HTTPStatusError: The ticketing API answered with a 5xx error
+    """
+    # Serialized once: these bytes are both signed and sent
+    body = encode_json(webhook_data)
+    if settings.WEBHOOK_SIGNATURE_VERSION == "v2":
+        signature_headers = timestamped_signature_headers(body)
+    else:
+        signature_headers = signer.headers(signature_message(webhook_data))
+
+    webhook_response = await client.post(
+        f"{settings.TICKETING_API_URL}/api/v1/payments/zibal-webhook",
+        content=body,
+        headers={
+            "Content-Type": "application/json",
+            **signature_headers
+        },
+        timeout=timeout or settings.UPSTREAM_TIMEOUT
+    )
+
+    if webhook_response.status_code >= 500:
+        webhook_response.raise_for_status()
+
+    return webhook_response.json()
+
+
+async def send_webhook_batch(client: httpx.AsyncClient, items: list) -> list:
+    """
+    POST several webhooks to the ticketing API bulk endpoint in one request
+
+    The body is ``{"items": [...]}`` and is signed as a whole; the endpoint
+    answers ``{"results": [...]}`` with one acknowledgement per item, each
+    carrying its ``trackId``.
+
+    Returns:
+        list: Per-item acknowledgements returned by the ticketing API
+
+    Raises:
+        httpx.RequestError: The ticketing API could not be reached
+        httpx.HTTPStatusError: The ticketing API answered with a 5xx error
+    """
+    body = encode_json({"items": items})
+    if settings.WEBHOOK_SIGNATURE_VERSION == "v2":
+        signature_headers = timestamped_signature_headers(body)
+    else:
+        signature_headers = signer.headers(body)
+
+    response = await client.post(
+        f"{settings.TICKETING_API_URL}{settings.WEBHOOK_BATCH_PATH}",
+        content=body,
+        headers={
+            "Content-Type": "application/json",
+            **signature_headers
+        },
+        timeout=settings.UPSTREAM_TIMEOUT
+    )
+
+    if response.status_code >= 500:
+        response.raise_for_status()
+
+    return response.json().get("results", [])